@@ -7,6 +7,7 @@ import numpy as np
 import quantecon as qe
 import matplotlib.pyplot as plt
 from numba import jit
+from scipy.optimize import brentq
 from aiyagari_household import Household, asset_marginal
 from quantecon.markov import DiscreteDP
 
@@ -31,8 +32,38 @@ def rd(K):
     """
     return A * alpha * (N / K)**(1 - alpha) - delta
 
+def kd(r):
+    """
+    Demand curve for capital.  The inverse of rd.
+    """
+    return N * (A * alpha / (r + delta))**(1 / (1 - alpha))
+
+
+def solve_household(am, r, v_init=None):
+    """
+    Set prices to those associated with r and compute the optimal policy
+    of the household by policy iteration, starting from v_init if given.
+    """
+    w = r_to_w(r)
+    am.set_prices(r, w)
+    if am.matrix_free:
+        return am.solve(method='policy_iteration', v_init=v_init)
+    aiyagari_ddp = DiscreteDP(am.R, am.Q, am.beta)
+    return aiyagari_ddp.solve(method='policy_iteration', v_init=v_init)
+
+
+def distribution_to_capital_stock(am, stationary_probs):
+    """
+    The aggregate capital stock implied by a distribution over the
+    household state space.
+    """
+    # Extract the marginal distribution for assets
+    asset_probs = asset_marginal(stationary_probs, am.a_size, am.z_size)
+    # Return K
+    return np.sum(asset_probs * am.a_vals)  
+
 
-def prices_to_capital_stock(am, r):
+def prices_to_capital_stock(am, r, v_init=None):
     """
     Map prices to the induced level of capital stock.
     
@@ -43,42 +74,85 @@ def prices_to_capital_stock(am, r):
         An instance of an aiyagari_household.Household 
     r : float
         The interest rate
+    v_init : array_like(float), optional(default=None)
+        Initial value function for policy iteration, such as the
+        solution at a nearby interest rate
     """
-    w = r_to_w(r)
-    am.set_prices(r, w)
-    aiyagari_ddp = DiscreteDP(am.R, am.Q, beta)
-    # Compute the optimal policy
-    results = aiyagari_ddp.solve(method='policy_iteration')
+    results = solve_household(am, r, v_init=v_init)
     # Compute the stationary distribution
-    stationary_probs = results.mc.stationary_distributions[0]
-    # Extract the marginal distribution for assets
-    asset_probs = asset_marginal(stationary_probs, am.a_size, am.z_size)
-    # Return K
-    return np.sum(asset_probs * am.a_vals)  
+    stationary_probs = am.stationary_distribution(results.sigma)
+    return distribution_to_capital_stock(am, stationary_probs)
+
+
+def compute_equilibrium(am, r_min=0.005, r_max=0.04, tol=1e-6):
+    """
+    Compute the equilibrium interest rate by applying Brent's method to
+    the excess supply of capital on [r_min, r_max].  Each household
+    problem is solved starting from the value function obtained at the
+    previously evaluated interest rate, and likewise for the
+    stationary distribution.
+
+    Returns
+    -------
+    r_star : float
+        The equilibrium interest rate, to within tol
+    K_star : float
+        The capital stock supplied by households at r_star
+    num_solves : int
+        The number of times the household problem was solved
+
+    """
+    # Mutable record of the last solution, for warm starts
+    last = {'v': None, 'psi': None, 'num_solves': 0}
+
+    def capital_supply(r):
+        results = solve_household(am, r, v_init=last['v'])
+        psi = am.stationary_distribution(results.sigma, psi_init=last['psi'])
+        last['v'], last['psi'] = results.v, psi
+        last['num_solves'] += 1
+        return distribution_to_capital_stock(am, psi)
+
+    r_star = brentq(lambda r: capital_supply(r) - kd(r), r_min, r_max,
+                    xtol=tol)
+    K_star = capital_supply(r_star)
+
+    return r_star, K_star, last['num_solves']
+
+
+if __name__ == '__main__':
 
+    # Create an instance of Household 
+    am = Household(a_max=20)
 
-# Create an instance of Household 
-am = Household(a_max=20)
+    # Use the instance to build a discrete dynamic program
+    am_ddp = DiscreteDP(am.R, am.Q, am.beta)
 
-# Use the instance to build a discrete dynamic program
-am_ddp = DiscreteDP(am.R, am.Q, am.beta)
+    # Create a grid of r values at which to compute demand and supply of capital
+    num_points = 20
+    r_vals = np.linspace(0.005, 0.04, num_points)
 
-# Create a grid of r values at which to compute demand and supply of capital
-num_points = 20
-r_vals = np.linspace(0.005, 0.04, num_points)
+    # Compute supply of capital, warm starting from the previous solution
+    k_vals = np.empty(num_points)
+    v, psi = None, None
+    for i, r in enumerate(r_vals):
+        results = solve_household(am, r, v_init=v)
+        psi = am.stationary_distribution(results.sigma, psi_init=psi)
+        k_vals[i] = distribution_to_capital_stock(am, psi)
+        v = results.v
 
-# Compute supply of capital
-k_vals = np.empty(num_points)
-for i, r in enumerate(r_vals):
-    k_vals[i] = prices_to_capital_stock(am, r)
+    # Compute the equilibrium directly
+    r_star, K_star, num_solves = compute_equilibrium(am)
+    print("Equilibrium r = {:.6f}, K = {:.4f} ({} household solves)".format(
+          r_star, K_star, num_solves))
 
-# Plot against demand for capital by firms
-fig, ax = plt.subplots(figsize=(11, 8))
-ax.plot(k_vals, r_vals, lw=2, alpha=0.6, label='supply of capital')
-ax.plot(k_vals, rd(k_vals), lw=2, alpha=0.6, label='demand for capital')
-ax.grid()
-ax.set_xlabel('capital')
-ax.set_ylabel('interest rate')
-ax.legend(loc='upper right')
+    # Plot against demand for capital by firms
+    fig, ax = plt.subplots(figsize=(11, 8))
+    ax.plot(k_vals, r_vals, lw=2, alpha=0.6, label='supply of capital')
+    ax.plot(k_vals, rd(k_vals), lw=2, alpha=0.6, label='demand for capital')
+    ax.grid()
+    ax.set_xlabel('capital')
+    ax.set_ylabel('interest rate')
+    ax.plot(K_star, r_star, 'ko', label='equilibrium')
+    ax.legend(loc='upper right')
 
-plt.show()
+    plt.show()
@@ -4,8 +4,14 @@ Created on Wed Sep 23 17:00:17 EDT 2015
 
 """
 
+import warnings
 import numpy as np
 from numba import jit
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import spsolve
+from quantecon import MarkovChain
+from quantecon.markov.ddp import DPSolveResult
 
 class Household:
     """
@@ -25,6 +31,14 @@ class Household:
         a_i = s_i // z_size  (integer division)
         z_i = s_i % z_size
 
+    If matrix_free is True, the arrays R and Q are not built.  The
+    transition is just "choose a' deterministically, draw z' from Pi",
+    so expectations can instead be computed by reshaping a function on
+    S to an (a_size, z_size) array and multiplying by Pi.  The methods
+    bellman_operator, compute_greedy, evaluate_policy and solve work
+    this way, with memory that scales like a_size * z_size, and mirror
+    the corresponding methods of DiscreteDP.
+
     """
 
 
@@ -36,7 +50,8 @@ class Household:
                 Pi = [[0.9, 0.1], [0.1, 0.9]],  # Markov chain
                 z_vals=[0.1, 1.0],              # exogenous states
                 a_max=18,
-                a_size=200):
+                a_size=200,
+                matrix_free=False):
         
         # Store values, set up grids over a and z
         self.r, self.w, self.beta = r, w, beta
@@ -48,14 +63,18 @@ class Household:
         
         self.a_vals = np.linspace(a_min, a_max, a_size)
         self.n = a_size * self.z_size
+        self.matrix_free = matrix_free
 
-        # Build the array Q
-        self.Q = np.zeros((self.n, a_size, self.n))
-        self.build_Q()
+        if matrix_free:
+            self.Q, self.R = None, None
+        else:
+            # Build the array Q
+            self.Q = np.zeros((self.n, a_size, self.n))
+            self.build_Q()
 
-        # Build the array R
-        self.R = np.empty((self.n, a_size))
-        self.build_R()
+            # Build the array R
+            self.R = np.empty((self.n, a_size))
+            self.build_R()
 
     def set_prices(self, r, w):
         """
@@ -63,7 +82,8 @@ class Household:
         re-build of R.
         """
         self.r, self.w = r, w 
-        self.build_R()
+        if not self.matrix_free:
+            self.build_R()
 
     def build_Q(self):
         populate_Q(self.Q, self.a_size, self.z_size, self.Pi)
@@ -72,6 +92,213 @@ class Household:
         self.R.fill(-np.inf)
         populate_R(self.R, self.a_size, self.z_size, self.a_vals, self.z_vals, self.r, self.w)
 
+    # == Matrix-free dynamic programming == #
+
+    def expectation(self, v):
+        """
+        Given v defined on S, return the array EV of shape (a_size,
+        z_size) with EV[a_i, z_i] = sum_j v(a_i, j) Pi[z_i, j], the
+        expected value of choosing a_vals[a_i] in state z_i.
+        """
+        return np.dot(np.reshape(v, (self.a_size, self.z_size)), self.Pi.T)
+
+    def bellman_operator(self, v, Tv=None, sigma=None):
+        """
+        The Bellman operator, computed without reference to R and Q.
+        If sigma is given, the v-greedy policy is stored in it.
+        """
+        if Tv is None:
+            Tv = np.empty(self.n)
+        if sigma is None:
+            sigma = np.empty(self.n, dtype=int)
+        bellman_max(self.expectation(v), self.a_size, self.z_size,
+                    self.a_vals, self.z_vals, self.r, self.w, self.beta,
+                    Tv, sigma)
+        return Tv
+
+    def compute_greedy(self, v, sigma=None):
+        """
+        Compute the v-greedy policy, as an array of indices into a_vals.
+        """
+        if sigma is None:
+            sigma = np.empty(self.n, dtype=int)
+        self.bellman_operator(v, sigma=sigma)
+        return sigma
+
+    def policy_transition(self, sigma):
+        """
+        The transition matrix on S under policy sigma, as a sparse
+        matrix with z_size nonzeros per row.
+        """
+        z_size = self.z_size
+        z_i = np.arange(self.n) % z_size
+        columns = (np.asarray(sigma)[:, None] * z_size +
+                   np.arange(z_size)).ravel()
+        data = self.Pi[z_i, :].ravel()
+        indptr = np.arange(self.n + 1) * z_size
+        return sparse.csr_matrix((data, columns, indptr),
+                                 shape=(self.n, self.n))
+
+    def controlled_mc(self, sigma):
+        """
+        The MarkovChain on S induced by policy sigma.
+        """
+        return MarkovChain(self.policy_transition(sigma))
+
+    def evaluate_policy(self, sigma):
+        """
+        Compute the value of policy sigma by solving the sparse linear
+        system (I - beta P_sigma) v = r_sigma.
+        """
+        a_i, z_i = np.divmod(np.arange(self.n), self.z_size)
+        c = (self.w * self.z_vals[z_i] + (1 + self.r) * self.a_vals[a_i]
+             - self.a_vals[sigma])
+        A = sparse.identity(self.n, format='csr') - \
+            self.beta * self.policy_transition(sigma)
+        return spsolve(A.tocsc(), np.log(c))
+
+    def stationary_distribution(self, sigma, psi_init=None, tol=1e-10,
+                                max_iter=100000, method='iterate'):
+        """
+        Compute the stationary distribution on S under policy sigma.
+
+        With method='iterate' the distribution is updated by pushing the
+        mass at (a_i, z_i) to (sigma[s_i], z') with probability
+        Pi[z_i, z'].  Each step costs O(n * z_size) and no transition
+        matrix is formed, so this is very fast when started from the
+        distribution of a nearby policy.  A warning is issued if the
+        iteration stops at max_iter without converging.
+
+        With method='direct' the mass at one recurrent state k is fixed
+        at 1, the linear system psi (I - P_sigma) = 0 is solved for the
+        remaining n - 1 states by sparse LU, and the result is
+        normalized to sum to one.  The system keeps the z_size + 1
+        nonzeros per column of I - P_sigma, so this avoids the slow
+        travel of mass across the asset grid that can make iteration
+        from a poor initial guess expensive.  The stationary
+        distribution is then not unique if P_sigma has more than one
+        closed class, and in that case the 'iterate' method is used
+        instead.
+
+        Parameters
+        ----------
+        sigma : array_like(int)
+            A policy, as indices into a_vals
+        psi_init : array_like(float), optional(default=None)
+            Initial distribution, such as the stationary distribution
+            for a nearby policy.  The default is uniform.  Ignored if
+            method='direct', unless P_sigma has more than one closed
+            class.
+        tol : scalar(float), optional(default=1e-10)
+            Stop when the sup norm change in the distribution falls
+            below tol
+        max_iter : scalar(int), optional(default=100000)
+            Maximum number of iterations
+        method : str, optional(default='iterate')
+            Either 'iterate' or 'direct'
+
+        Returns
+        -------
+        psi : array_like(float)
+            The stationary distribution, indexed by s_i
+
+        """
+        if method == 'direct':
+            P = self.policy_transition(sigma)
+            # Drop the explicit zeros that come from zeros in Pi, which
+            # connected_components would otherwise count as edges
+            P.eliminate_zeros()
+            # Take k in a closed class, i.e., a strongly connected
+            # component of the transition graph that no transition
+            # leaves, so that psi[k] > 0
+            num_classes, labels = connected_components(P, directed=True,
+                                                       connection='strong')
+            rows, cols = P.nonzero()
+            is_open = np.zeros(num_classes, dtype=bool)
+            is_open[labels[rows[labels[rows] != labels[cols]]]] = True
+
+            # With more than one closed class the reduced system is
+            # singular, so fall back to iteration below
+            if np.sum(~is_open) == 1:
+                k = np.flatnonzero(~is_open[labels])[0]
+
+                # Solve psi[-k] (I - P)[-k, -k] = psi[k] P[k, -k] with
+                # psi[k] = 1
+                keep = np.arange(self.n) != k
+                A = (sparse.identity(self.n, format='csr') - P).T.tocsr()
+                A = A[keep][:, keep].tocsc()
+                b = P[k].toarray().ravel()[keep]
+                psi = np.ones(self.n)
+                psi[keep] = spsolve(A, b)
+                return psi / psi.sum()
+        elif method != 'iterate':
+            raise ValueError("method must be 'iterate' or 'direct'")
+
+        if psi_init is None:
+            psi = np.ones(self.n) / self.n
+        else:
+            psi = np.array(psi_init, dtype=float)
+        dist = iterate_distribution(psi, np.asarray(sigma), self.Pi,
+                                    self.z_size, tol, max_iter)
+        if dist >= tol:
+            msg = "stationary_distribution did not converge in {} " + \
+                  "iterations (distance {:.2e})"
+            warnings.warn(msg.format(max_iter, dist), RuntimeWarning)
+        return psi
+
+    def solve(self, method='policy_iteration', v_init=None,
+              epsilon=1e-3, max_iter=250):
+        """
+        Solve the household problem by 'policy_iteration' or
+        'value_iteration', in the same manner as DiscreteDP.solve.
+
+        Returns
+        -------
+        res : DPSolveResult
+            Contains v, sigma, num_iter, mc, method and max_iter
+
+        """
+        if v_init is None:
+            # The largest one period reward in each state
+            a_i, z_i = np.divmod(np.arange(self.n), self.z_size)
+            v_init = np.log(self.w * self.z_vals[z_i] +
+                            (1 + self.r) * self.a_vals[a_i] -
+                            self.a_vals[0])
+
+        if method in ['policy_iteration', 'pi']:
+            sigma = self.compute_greedy(v_init)
+            new_sigma = np.empty(self.n, dtype=int)
+            for i in range(max_iter):
+                v = self.evaluate_policy(sigma)
+                self.compute_greedy(v, sigma=new_sigma)
+                if np.array_equal(new_sigma, sigma):
+                    break
+                sigma[:] = new_sigma
+            method = 'policy iteration'
+
+        elif method in ['value_iteration', 'vi']:
+            tol = epsilon * (1 - self.beta) / (2 * self.beta)
+            v, Tv = np.array(v_init, dtype=float), np.empty(self.n)
+            sigma = np.empty(self.n, dtype=int)
+            for i in range(max_iter):
+                self.bellman_operator(v, Tv=Tv)
+                dist = np.max(np.abs(Tv - v))
+                v[:] = Tv
+                if dist < tol:
+                    break
+            self.compute_greedy(v, sigma=sigma)
+            method = 'value iteration'
+
+        else:
+            raise ValueError('invalid method')
+
+        return DPSolveResult(v=v,
+                             sigma=sigma,
+                             num_iter=i + 1,
+                             mc=self.controlled_mc(sigma),
+                             method=method,
+                             max_iter=max_iter)
+
 
 # Do the hard work using JIT-ed functions
 
@@ -99,6 +326,53 @@ def populate_Q(Q, a_size, z_size, Pi):
                 Q[s_i, a_i, a_i * z_size + next_z_i] = Pi[z_i, next_z_i]
 
 
+@jit(nopython=True)
+def bellman_max(EV, a_size, z_size, a_vals, z_vals, r, w, beta, Tv, sigma):
+    n = a_size * z_size
+    for s_i in range(n):
+        a_i = s_i // z_size
+        z_i = s_i % z_size
+        a = a_vals[a_i]
+        z = z_vals[z_i]
+        current_max = -np.inf
+        current_max_index = 0
+        for new_a_i in range(a_size):
+            c = w * z + (1 + r) * a - a_vals[new_a_i]
+            if c <= 0:
+                break  # a_vals is increasing, so c is decreasing
+            m = np.log(c) + beta * EV[new_a_i, z_i]
+            if m > current_max:
+                current_max = m
+                current_max_index = new_a_i
+        Tv[s_i] = current_max
+        sigma[s_i] = current_max_index
+
+
+@jit(nopython=True)
+def iterate_distribution(psi, sigma, Pi, z_size, tol, max_iter):
+    """
+    Iterate psi' = psi P_sigma until convergence, updating psi in place.
+    Returns the sup norm distance between the last two iterates.
+    """
+    n = len(psi)
+    new_psi = np.empty(n)
+    dist = np.inf
+    for i in range(max_iter):
+        new_psi[:] = 0.0
+        for s_i in range(n):
+            z_i = s_i % z_size
+            offset = sigma[s_i] * z_size
+            for next_z_i in range(z_size):
+                new_psi[offset + next_z_i] += psi[s_i] * Pi[z_i, next_z_i]
+        dist = 0.0
+        for s_i in range(n):
+            dist = max(dist, abs(new_psi[s_i] - psi[s_i]))
+            psi[s_i] = new_psi[s_i]
+        if dist < tol:
+            break
+    return dist
+
+
 @jit(nopython=True)
 def asset_marginal(s_probs, a_size, z_size):
     a_probs = np.zeros(a_size)
@@ -0,0 +1,410 @@
+"""
+Filename: aiyagari_transition.py
+
+Computes perfect foresight transition dynamics for the Aiyagari economy
+after an unanticipated ("MIT") shock to the path of TFP.
+
+The household block uses the primitives of an
+aiyagari_household.Household (the asset grid, the Markov chain for z,
+the discount factor and log utility), but treats savings as a
+continuous choice, solved by the endogenous grid method, with the
+distribution moved forward by lotteries over the asset grid.  This
+makes aggregate capital a smooth function of prices, which is what the
+sequence space Jacobian requires.  Given the Jacobians of household
+asset supply with respect to the paths of r and w, computed once at the
+steady state with the "fake news" algorithm, the path of capital is
+updated by quasi-Newton steps.
+
+References
+----------
+
+.. Auclert, A., Bardoczy, B., Rognlie, M. and Straub, L. "Using the
+   Sequence-Space Jacobian to Solve and Estimate Heterogeneous-Agent
+   Models." Econometrica (2021): 2375-2408.
+
+"""
+import warnings
+import numpy as np
+from numba import jit
+from scipy.optimize import brentq
+from aiyagari_household import asset_marginal
+
+
+class AiyagariTransition(object):
+    """
+    Steady state and transition dynamics of an Aiyagari economy whose
+    households are described by an instance of Household.  Time t
+    capital is K_{t-1}, the assets chosen by households at t-1, and
+
+        r_t = alpha Z_t (K_{t-1} / N)^(alpha - 1) - delta
+        w_t = (1 - alpha) Z_t (K_{t-1} / N)^alpha
+
+    Parameters
+    ----------
+    am : Household
+        An instance of aiyagari_household.Household.  Only the
+        attributes a_vals, z_vals, Pi and beta are used, so a
+        matrix_free Household is sufficient.
+    A : scalar(float), optional(default=1.0)
+        Steady state TFP
+    N : scalar(float), optional(default=1.0)
+        Labor supply
+    alpha : scalar(float), optional(default=0.33)
+        Capital share
+    delta : scalar(float), optional(default=0.05)
+        Depreciation rate
+    T : scalar(int), optional(default=300)
+        Length of the transition, after which the economy is assumed
+        to be back at the steady state
+
+    Attributes
+    ----------
+    r_ss, w_ss, K_ss : scalar(float)
+        Steady state prices and capital, set by steady_state
+    a_pol_ss, D_ss : array_like(float)
+        Steady state savings policy and distribution, as arrays of
+        shape (a_size, z_size)
+
+    Examples
+    --------
+    >>> am = Household(a_max=20, matrix_free=True)
+    >>> tr = AiyagariTransition(am)
+    >>> tr.steady_state()
+    >>> Z_path = 1 + 0.01 * 0.9**np.arange(tr.T)
+    >>> K_path, r_path, w_path, num_iter = tr.solve(Z_path)
+
+    """
+
+    def __init__(self, am, A=1.0, N=1.0, alpha=0.33, delta=0.05, T=300):
+        self.am, self.T = am, T
+        self.A, self.N, self.alpha, self.delta = A, N, alpha, delta
+        self.a_vals = am.a_vals
+        self.z_vals, self.Pi = np.asarray(am.z_vals, dtype=float), am.Pi
+        self.beta = am.beta
+        self.shape = am.a_size, am.z_size
+        self.r_ss = None
+        self._J = None
+
+    def prices(self, K, Z=None):
+        """
+        The interest rate and wage implied by capital K and TFP Z, which
+        may be scalars or arrays.
+        """
+        Z = self.A if Z is None else Z
+        k = K / self.N
+        r = self.alpha * Z * k**(self.alpha - 1) - self.delta
+        w = (1 - self.alpha) * Z * k**self.alpha
+        return r, w
+
+    def capital_demand(self, r):
+        """
+        Firms' demand for capital at steady state TFP and interest rate r.
+        """
+        return self.N * (self.alpha * self.A /
+                         (r + self.delta))**(1 / (1 - self.alpha))
+
+    def aggregate_assets(self, D):
+        """
+        Total assets held under the distribution D over (a_i, z_i).
+        """
+        a_probs = asset_marginal(D.ravel(), self.shape[0], self.shape[1])
+        return np.dot(a_probs, self.a_vals)
+
+    def household_steady_state(self, r, w, Va_init=None, tol=1e-10,
+                               max_iter=10000):
+        """
+        Solve for the stationary savings policy and distribution of the
+        household at constant prices r and w.
+
+        Returns
+        -------
+        Va : array_like(float)
+            The derivative of the value function with respect to assets
+        a_pol : array_like(float)
+            The savings policy
+        D : array_like(float)
+            The stationary distribution
+
+        """
+        a_vals, z_vals, Pi, beta = self.a_vals, self.z_vals, self.Pi, self.beta
+        if Va_init is None:
+            coh = (1 + r) * a_vals[:, None] + w * z_vals
+            Va = (1 + r) / (0.1 * coh)
+        else:
+            Va = Va_init.copy()
+        Va_new, a_pol = np.empty(self.shape), np.empty(self.shape)
+
+        for i in range(max_iter):
+            egm_step(Va, Pi, a_vals, z_vals, beta, r, w, a_pol, Va_new)
+            dist = np.max(np.abs(Va_new - Va))
+            Va[:] = Va_new
+            if dist < tol:
+                break
+
+        idx, wt = np.empty(self.shape, dtype=np.int64), np.empty(self.shape)
+        lottery(a_pol, a_vals, idx, wt)
+        D = np.ones(self.shape) / np.prod(self.shape)
+        D_new = np.empty(self.shape)
+        for i in range(max_iter):
+            forward_step(D, idx, wt, Pi, D_new)
+            dist = np.max(np.abs(D_new - D))
+            D[:] = D_new
+            if dist < tol:
+                break
+
+        return Va, a_pol, D
+
+    def steady_state(self, r_min=None, r_max=None, tol=1e-10):
+        """
+        Compute the steady state by applying Brent's method to the excess
+        supply of capital.  The results are stored as attributes and
+        any previously computed Jacobians are discarded.
+        """
+        if r_min is None:
+            r_min = -self.delta + 1e-3
+        if r_max is None:
+            r_max = 1 / self.beta - 1 - 1e-4
+        last = {'Va': None}
+
+        def excess_supply(r):
+            w = self.prices(self.capital_demand(r))[1]
+            Va, a_pol, D = self.household_steady_state(r, w, last['Va'])
+            last['Va'] = Va
+            return self.aggregate_assets(D) - self.capital_demand(r)
+
+        self.r_ss = brentq(excess_supply, r_min, r_max, xtol=tol)
+        self.K_ss = self.capital_demand(self.r_ss)
+        self.w_ss = self.prices(self.K_ss)[1]
+        self.Va_ss, self.a_pol_ss, self.D_ss = \
+            self.household_steady_state(self.r_ss, self.w_ss, last['Va'])
+        self._J = None
+
+    def household_path(self, r_path, w_path):
+        """
+        Given paths for r and w of length T, iterate backward from the
+        steady state on the savings policy, then forward from the
+        steady state distribution, and return the path of aggregate
+        assets chosen by households in each period.
+        """
+        T, shape = self.T, self.shape
+        a_vals, z_vals, Pi, beta = self.a_vals, self.z_vals, self.Pi, self.beta
+
+        a_pols = np.empty((T,) + shape)
+        Va, Va_new = self.Va_ss.copy(), np.empty(shape)
+        for t in range(T - 1, -1, -1):
+            egm_step(Va, Pi, a_vals, z_vals, beta, r_path[t], w_path[t],
+                     a_pols[t], Va_new)
+            Va, Va_new = Va_new, Va
+
+        A_path = np.empty(T)
+        D, D_new = self.D_ss.copy(), np.empty(shape)
+        idx, wt = np.empty(shape, dtype=np.int64), np.empty(shape)
+        for t in range(T):
+            lottery(a_pols[t], a_vals, idx, wt)
+            forward_step(D, idx, wt, Pi, D_new)
+            D, D_new = D_new, D
+            A_path[t] = self.aggregate_assets(D)
+
+        return A_path
+
+    def jacobians(self, h=1e-4):
+        """
+        Compute the T x T Jacobians of the path of aggregate household
+        assets with respect to the paths of r and w, at the steady
+        state, by the fake news algorithm.  This requires one backward
+        iteration per input rather than one per input and date.
+
+        Returns
+        -------
+        J_r, J_w : array_like(float)
+            J_r[t, s] is the derivative of assets chosen at t with
+            respect to r_s, and likewise for J_w
+
+        """
+        if self.r_ss is None:
+            self.steady_state()
+        T, shape = self.T, self.shape
+        a_vals, z_vals, Pi, beta = self.a_vals, self.z_vals, self.Pi, self.beta
+        r_ss, w_ss, D_ss = self.r_ss, self.w_ss, self.D_ss
+
+        # == Steady state lotteries and expectation vectors == #
+        idx_ss, wt_ss = np.empty(shape, dtype=np.int64), np.empty(shape)
+        lottery(self.a_pol_ss, a_vals, idx_ss, wt_ss)
+        D1_ss = np.empty(shape)
+        forward_step(D_ss, idx_ss, wt_ss, Pi, D1_ss)
+        Y_ss = np.sum(D_ss * self.a_pol_ss)
+        E = np.empty((T - 1,) + shape)
+        E[0] = self.a_pol_ss
+        for k in range(1, T - 1):
+            expectation_step(E[k-1], idx_ss, wt_ss, Pi, E[k])
+
+        jacobians = []
+        for shock_r, shock_w in [(h, 0.0), (0.0, h)]:
+            # == Effect of a shock u periods ahead on outcomes today and
+            # on tomorrow's distribution == #
+            curlyY, curlyD = np.empty(T), np.empty((T,) + shape)
+            Va, Va_new = self.Va_ss.copy(), np.empty(shape)
+            a_pol = np.empty(shape)
+            idx, wt = np.empty(shape, dtype=np.int64), np.empty(shape)
+            D1 = np.empty(shape)
+            for u in range(T):
+                r = r_ss + shock_r if u == 0 else r_ss
+                w = w_ss + shock_w if u == 0 else w_ss
+                egm_step(Va, Pi, a_vals, z_vals, beta, r, w, a_pol, Va_new)
+                Va, Va_new = Va_new, Va
+                curlyY[u] = (np.sum(D_ss * a_pol) - Y_ss) / h
+                lottery(a_pol, a_vals, idx, wt)
+                forward_step(D_ss, idx, wt, Pi, D1)
+                curlyD[u] = (D1 - D1_ss) / h
+
+            # == Fake news matrix, then accumulate along diagonals == #
+            F = np.empty((T, T))
+            F[0, :] = curlyY
+            F[1:, :] = np.dot(E.reshape(T - 1, -1), curlyD.reshape(T, -1).T)
+            J = F.copy()
+            for t in range(1, T):
+                J[t, 1:] += J[t-1, :-1]
+            jacobians.append(J)
+
+        return tuple(jacobians)
+
+    def solve(self, Z_path, tol=1e-8, max_iter=50, verbose=False):
+        """
+        Compute the perfect foresight path of capital following the
+        unanticipated TFP path Z_path, starting from the steady state.
+        The asset market clearing residual H(K) = A(r(K), w(K)) - K is
+        driven to zero by quasi-Newton iteration, using the Jacobian of
+        H at the steady state.
+
+        Parameters
+        ----------
+        Z_path : array_like(float)
+            TFP in periods 0, ..., T-1
+        tol : scalar(float), optional(default=1e-8)
+            Tolerance for the maximum absolute market clearing residual
+        max_iter : scalar(int), optional(default=50)
+            Maximum number of quasi-Newton steps
+        verbose : bool, optional(default=False)
+            Whether to print the residual at each step
+
+        Returns
+        -------
+        K_path : array_like(float)
+            Capital chosen in periods 0, ..., T-1
+        r_path, w_path : array_like(float)
+            Prices in periods 0, ..., T-1
+        num_iter : int
+            Number of quasi-Newton steps taken.  A warning is issued if
+            the residual is still above tol after max_iter steps, in
+            which case the prices returned are those implied by the
+            final K_path.
+
+        """
+        if self.r_ss is None:
+            self.steady_state()
+        if self._J is None:
+            self._J = self.jacobians()
+        J_r, J_w = self._J
+        T, alpha, K_ss = self.T, self.alpha, self.K_ss
+        Z_path = np.asarray(Z_path, dtype=float)
+
+        # == Jacobian of H with respect to the path of K == #
+        k_ss = K_ss / self.N
+        dr = alpha * (alpha - 1) * self.A * k_ss**(alpha - 2) / self.N
+        dw = alpha * (1 - alpha) * self.A * k_ss**(alpha - 1) / self.N
+        lag = np.eye(T, k=-1)  # maps K_t to period t+1 prices
+        H_K = np.dot(dr * J_r + dw * J_w, lag) - np.eye(T)
+        H_K_inv = np.linalg.inv(H_K)
+
+        K_path = np.full(T, K_ss)
+        for i in range(max_iter + 1):
+            K_lag = np.concatenate(([K_ss], K_path[:-1]))
+            r_path, w_path = self.prices(K_lag, Z_path)
+            H = self.household_path(r_path, w_path) - K_path
+            error = np.max(np.abs(H))
+            if verbose:
+                print("Iteration {} with residual {}".format(i, error))
+            if error < tol:
+                break
+            if i == max_iter:
+                msg = "solve did not converge in {} iterations " + \
+                      "(residual {:.2e})"
+                warnings.warn(msg.format(max_iter, error), RuntimeWarning)
+                break
+            K_path -= np.dot(H_K_inv, H)
+
+        return K_path, r_path, w_path, i
+
+
+# == JIT-ed building blocks for the household block == #
+
+@jit(nopython=True)
+def egm_step(Va_next, Pi, a_vals, z_vals, beta, r, w, a_pol, Va):
+    """
+    One backward step of the endogenous grid method with log utility.
+    Given the derivative Va_next of next period's value function on
+    the grid, compute this period's savings policy a_pol and Va, for
+    prices r and w.  Assets must be at least a_vals[0].
+    """
+    a_size, z_size = a_pol.shape
+    W = beta * np.dot(Va_next, Pi.T)
+    for z_i in range(z_size):
+        y = w * z_vals[z_i]
+        # Current assets at which a_vals[j] is the optimal choice
+        a_endog = (1 / W[:, z_i] + a_vals - y) / (1 + r)
+        a_pol[:, z_i] = np.interp(a_vals, a_endog, a_vals)
+        for a_i in range(a_size):
+            c = (1 + r) * a_vals[a_i] + y - a_pol[a_i, z_i]
+            Va[a_i, z_i] = (1 + r) / c
+
+
+@jit(nopython=True)
+def lottery(a_pol, a_vals, idx, wt):
+    """
+    Represent each choice a_pol[a_i, z_i] as a lottery between the grid
+    points idx[a_i, z_i] and idx[a_i, z_i] + 1, with probability
+    wt[a_i, z_i] on the lower point.
+    """
+    a_size, z_size = a_pol.shape
+    for a_i in range(a_size):
+        for z_i in range(z_size):
+            a = a_pol[a_i, z_i]
+            i = np.searchsorted(a_vals, a) - 1
+            i = min(max(i, 0), a_size - 2)
+            p = (a_vals[i+1] - a) / (a_vals[i+1] - a_vals[i])
+            idx[a_i, z_i] = i
+            wt[a_i, z_i] = min(max(p, 0.0), 1.0)
+
+
+@jit(nopython=True)
+def forward_step(D, idx, wt, Pi, D_new):
+    """
+    Move the distribution D over (a_i, z_i) forward one period, given
+    the lotteries (idx, wt) and the Markov matrix Pi.
+    """
+    a_size, z_size = D.shape
+    D_new[:, :] = 0.0
+    for a_i in range(a_size):
+        for z_i in range(z_size):
+            i, p, m = idx[a_i, z_i], wt[a_i, z_i], D[a_i, z_i]
+            for next_z_i in range(z_size):
+                mass = m * Pi[z_i, next_z_i]
+                D_new[i, next_z_i] += p * mass
+                D_new[i+1, next_z_i] += (1 - p) * mass
+
+
+@jit(nopython=True)
+def expectation_step(E_next, idx, wt, Pi, E):
+    """
+    The adjoint of forward_step: E[a_i, z_i] is the expectation of
+    E_next next period, conditional on (a_i, z_i) today.
+    """
+    a_size, z_size = E.shape
+    for a_i in range(a_size):
+        for z_i in range(z_size):
+            i, p = idx[a_i, z_i], wt[a_i, z_i]
+            total = 0.0
+            for next_z_i in range(z_size):
+                total += Pi[z_i, next_z_i] * (p * E_next[i, next_z_i] +
+                                              (1 - p) * E_next[i+1, next_z_i])
+            E[a_i, z_i] = total
@@ -0,0 +1,74 @@
+"""
+Tests for aiyagari_household
+
+"""
+from __future__ import division
+import unittest
+import numpy as np
+from aiyagari_household import Household
+from quantecon.markov import DiscreteDP
+
+
+class TestHouseholdMatrixFree(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.am = Household(a_max=20, a_size=60)
+        cls.am_mf = Household(a_max=20, a_size=60, matrix_free=True)
+        ddp = DiscreteDP(cls.am.R, cls.am.Q, cls.am.beta)
+        cls.res = ddp.solve(method='policy_iteration')
+
+    def test_solve_pi(self):
+        "aiyagari: matrix-free policy iteration agrees with DiscreteDP"
+        res_mf = self.am_mf.solve(method='policy_iteration')
+        np.testing.assert_array_equal(res_mf.sigma, self.res.sigma)
+        np.testing.assert_allclose(res_mf.v, self.res.v, rtol=1e-10)
+
+    def test_solve_vi(self):
+        "aiyagari: matrix-free value iteration agrees with DiscreteDP"
+        res_mf = self.am_mf.solve(method='value_iteration', epsilon=1e-6,
+                                  max_iter=5000)
+        np.testing.assert_array_equal(res_mf.sigma, self.res.sigma)
+
+    def test_compute_greedy(self):
+        "aiyagari: matrix-free greedy policy agrees with DiscreteDP"
+        ddp = DiscreteDP(self.am.R, self.am.Q, self.am.beta)
+        v = self.res.v * 0.99
+        np.testing.assert_array_equal(self.am_mf.compute_greedy(v),
+                                      ddp.compute_greedy(v))
+        np.testing.assert_allclose(self.am_mf.bellman_operator(v),
+                                   ddp.bellman_operator(v), rtol=1e-12)
+
+
+class TestStationaryDistribution(unittest.TestCase):
+
+    def test_direct_with_zeros_in_Pi(self):
+        "aiyagari: direct stationary distribution when Pi has zeros"
+        am = Household(a_max=20, a_size=50, matrix_free=True,
+                       Pi=[[0.5, 0.5], [0.0, 1.0]])
+        sigma = am.solve().sigma
+        psi_direct = am.stationary_distribution(sigma, method='direct')
+        psi_iterate = am.stationary_distribution(sigma, tol=1e-14)
+        self.assertFalse(np.isnan(psi_direct).any())
+        np.testing.assert_allclose(psi_direct, psi_iterate, atol=1e-10)
+
+    def test_direct_agrees_with_iterate(self):
+        "aiyagari: direct and iterated stationary distributions agree"
+        am = Household(a_max=20, a_size=50, matrix_free=True)
+        sigma = am.solve().sigma
+        psi_direct = am.stationary_distribution(sigma, method='direct')
+        psi_iterate = am.stationary_distribution(sigma, tol=1e-14)
+        np.testing.assert_allclose(psi_direct, psi_iterate, atol=1e-10)
+
+    def test_direct_several_closed_classes(self):
+        "aiyagari: direct stationary distribution with two closed classes"
+        am = Household(a_max=20, a_size=50, matrix_free=True,
+                       Pi=[[1.0, 0.0], [0.0, 1.0]])
+        sigma = am.solve().sigma
+        psi_direct = am.stationary_distribution(sigma, method='direct')
+        psi_iterate = am.stationary_distribution(sigma)
+        self.assertFalse(np.isnan(psi_direct).any())
+        np.testing.assert_allclose(psi_direct, psi_iterate)
+        P = am.policy_transition(sigma)
+        np.testing.assert_allclose(P.T.dot(psi_direct), psi_direct,
+                                   atol=1e-12)
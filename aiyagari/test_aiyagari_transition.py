@@ -0,0 +1,69 @@
+"""
+Tests for aiyagari_transition
+
+"""
+from __future__ import division
+import unittest
+import warnings
+import numpy as np
+from aiyagari_household import Household
+from aiyagari_transition import AiyagariTransition
+
+
+class TestAiyagariTransition(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        am = Household(a_max=20, a_size=60, matrix_free=True)
+        cls.tr = AiyagariTransition(am, T=80)
+        cls.tr.steady_state()
+        cls.J_r, cls.J_w = cls.tr.jacobians()
+        cls.r_ss = np.full(cls.tr.T, cls.tr.r_ss)
+        cls.w_ss = np.full(cls.tr.T, cls.tr.w_ss)
+        cls.A_ss = cls.tr.household_path(cls.r_ss, cls.w_ss)
+        cls.Z_path = 1 + 0.01 * 0.8**np.arange(cls.tr.T)
+
+    def test_steady_state_path(self):
+        "aiyagari_transition: steady state prices keep assets at K_ss"
+        np.testing.assert_allclose(self.A_ss, self.tr.K_ss, atol=1e-5)
+
+    def test_jacobians_finite_difference(self):
+        "aiyagari_transition: fake news Jacobians match finite differences"
+        h = 1e-4
+        for s in [0, 5, 20]:
+            r_path = self.r_ss.copy()
+            r_path[s] += h
+            fd_r = (self.tr.household_path(r_path, self.w_ss) - self.A_ss) / h
+            np.testing.assert_allclose(fd_r, self.J_r[:, s], atol=1e-3)
+            w_path = self.w_ss.copy()
+            w_path[s] += h
+            fd_w = (self.tr.household_path(self.r_ss, w_path) - self.A_ss) / h
+            np.testing.assert_allclose(fd_w, self.J_w[:, s], atol=1e-4)
+
+    def test_solve_tfp_shock(self):
+        "aiyagari_transition: small TFP shock converges"
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            K_path, r_path, w_path, num_iter = self.tr.solve(self.Z_path)
+        self.assertLess(num_iter, 10)
+        self.assertTrue((K_path > self.tr.K_ss).all())
+        K_lag = np.concatenate(([self.tr.K_ss], K_path[:-1]))
+        np.testing.assert_allclose(
+            self.tr.household_path(r_path, w_path), K_path, atol=1e-8)
+        np.testing.assert_allclose(K_path[-1], self.tr.K_ss, rtol=1e-3)
+        np.testing.assert_allclose(r_path,
+                                   self.tr.prices(K_lag, self.Z_path)[0])
+
+    def test_solve_not_converged(self):
+        "aiyagari_transition: warn at max_iter, prices match final K_path"
+        with warnings.catch_warnings(record=True) as record:
+            warnings.simplefilter('always')
+            K_path, r_path, w_path, num_iter = \
+                self.tr.solve(self.Z_path, tol=1e-14, max_iter=1)
+        self.assertEqual(num_iter, 1)
+        self.assertTrue(any(issubclass(x.category, RuntimeWarning)
+                            for x in record))
+        K_lag = np.concatenate(([self.tr.K_ss], K_path[:-1]))
+        r, w = self.tr.prices(K_lag, self.Z_path)
+        np.testing.assert_allclose(r_path, r)
+        np.testing.assert_allclose(w_path, w)
@@ -15,10 +15,12 @@ http://quant-econ.net/py/arellano.html
 
 """
 from __future__ import division
+import copy
+import time
 import numpy as np
 import random
 import quantecon as qe
-from numba import jit
+from numba import jit, prange
 
 
 class Arellano_Economy(object):
@@ -50,28 +52,78 @@ class Arellano_Economy(object):
         Error tolerance in iteration
     maxit : int
         Maximum number of iterations
+    method : str, optional(default='brute_force')
+        How the maximization over B' is carried out.  'brute_force'
+        scans the whole of Bgrid for every (y, B) pair.  'monotone'
+        exploits the fact that the savings policy is nondecreasing in
+        B, and so only searches between the choices made at bracketing
+        grid points (binary monotonicity).  This reduces the cost of
+        each iteration from O(ny nB^2) to O(ny nB log nB).
+    parallel : bool, optional(default=False)
+        If True, the Bellman and savings policy updates are spread
+        across cores.  With 'brute_force' the work is split over (y, B)
+        pairs, with 'monotone' over income states.  The number of
+        threads is set through numba (e.g. NUMBA_NUM_THREADS).
+    verbose : bool, optional(default=True)
+        Whether to print progress while solving
+    callback : callable, optional(default=None)
+        Called after every iteration of solve with a dictionary of
+        diagnostics.  See solve and ConvergenceRecorder.
+    coarse_grids : sequence of tuples, optional(default=None)
+        A sequence of (ny, nB) pairs, ordered from coarse to fine.  If
+        given, the model is first solved on each of these grids in
+        turn, with each solution interpolated onto the next grid as the
+        initial condition, before solving at the target (ny, nB).  The
+        callback and the savings policy are only computed at the target.
+        On small grids the discretized model can have more than one
+        fixed point, differing in a few default states, so the result
+        may then differ from that of a solve from the default guess.
     """
 
-    def __init__(self, 
-            beta=.953,      # time discount rate
-            gamma=2.,       # risk aversion
-            r=0.017,        # international interest rate
-            rho=.945,       # persistence in output 
-            eta=0.025,      # st dev of output shock
-            theta=0.282,    # prob of regaining access 
-            ny=21,          # number of points in y grid
-            nB=251,         # number of points in B grid
-            tol=1e-8,       # error tolerance in iteration
-            maxit=10000):
+    def __init__(self,
+                 beta=.953,    # time discount rate
+                 gamma=2.,     # risk aversion
+                 r=0.017,      # international interest rate
+                 rho=.945,     # persistence in output
+                 eta=0.025,    # st dev of output shock
+                 theta=0.282,  # prob of regaining access
+                 ny=21,        # number of points in y grid
+                 nB=251,       # number of points in B grid
+                 tol=1e-8,     # error tolerance in iteration
+                 maxit=10000,
+                 method='brute_force',
+                 parallel=False,
+                 verbose=True,
+                 callback=None,
+                 coarse_grids=None):
 
         # Save parameters
         self.beta, self.gamma, self.r = beta, gamma, r
         self.rho, self.eta, self.theta = rho, eta, theta
+        self.method, self.parallel = method, parallel
+        self._setup_grids(ny, nB)
+
+        # Solve on coarser grids first to get a good initial condition
+        if coarse_grids:
+            coarse = self._solve_coarse(coarse_grids, tol, maxit, verbose)
+            self.interpolate_from(coarse)
+
+        # Compute the value functions, prices, and default prob 
+        self.solve(tol=tol, maxit=maxit, verbose=verbose, callback=callback)
+        # Compute the optimal savings policy conditional on no default
+        self.compute_savings_policy()
+
+
+    def _setup_grids(self, ny, nB):
+        """
+        Create the grids for (y, B) and allocate the value functions,
+        prices and default probabilities on them.
+        """
         self.ny, self.nB = ny, nB
 
         # Create grids and discretize Markov process
         self.Bgrid = np.linspace(-.45, .45, nB)
-        self.mc = qe.markov.tauchen(rho, eta, 3, ny)
+        self.mc = qe.markov.tauchen(self.rho, self.eta, 3, ny)
         self.ygrid = np.exp(self.mc.state_values)
         self.Py = self.mc.P
 
@@ -86,39 +138,94 @@ class Arellano_Economy(object):
         self.Q = np.ones((ny, nB)) * .95  # Initial guess for prices
         self.default_prob = np.empty((ny, nB)) 
 
-        # Compute the value functions, prices, and default prob 
-        self.solve(tol=tol, maxit=maxit)
-        # Compute the optimal savings policy conditional on no default
-        self.compute_savings_policy()
+
+    def _solve_coarse(self, coarse_grids, tol, maxit, verbose):
+        """
+        Solve the model on each (ny, nB) in coarse_grids in turn,
+        starting each from the previous solution, and return the
+        economy solved on the last of them.  Only V, Vc, Vd and Q are
+        computed on these grids: the savings policy and the callback
+        are reserved for the target grid.
+        """
+        coarse = None
+        for ny, nB in coarse_grids:
+            econ = copy.copy(self)
+            econ._setup_grids(ny, nB)
+            if coarse is not None:
+                econ.interpolate_from(coarse)
+            econ.solve(tol=tol, maxit=maxit, verbose=verbose)
+            coarse = econ
+
+        return coarse
 
 
-    def solve(self, tol=1e-8, maxit=10000):
+    def solve(self, tol=1e-8, maxit=10000, method=None, parallel=None,
+              verbose=True, callback=None):
+        """
+        Iterate on the Bellman equations and the bond price schedule
+        until the value function converges.  The optional method and
+        parallel arguments override the instance attributes of the same
+        name, which is useful for checking the 'monotone' solution
+        against 'brute_force'.
+
+        If callback is not None, it is called after every iteration
+        with a dictionary containing
+
+            * 'iteration' : the iteration number
+            * 'dist' : the sup norm distance between successive V
+            * 'Q_dist' : the sup norm distance between successive Q
+            * 'default_changes' : the number of (y, B) states at which
+              the default decision changed
+            * 'time_expectations', 'time_bellman', 'time_prices' : wall
+              time spent computing expectations, updating Vc and Vd,
+              and updating default probabilities and prices
+            * 'time' : total wall time of the iteration
+
+        Setting verbose=False suppresses the progress messages.
+
+        Returns
+        -------
+        it : int
+            The number of iterations performed
+
+        """
+        if parallel is None:
+            parallel = self.parallel
+        inner_loop = _get_inner_loop(method or self.method, parallel)
+
         # Iteration Stuff
         it = 0
         dist = 10.
 
         # Alloc memory to store next iterate of value function
         V_upd = np.zeros((self.ny, self.nB))
+        default_states = self.Vd[:, None] > self.Vc
 
         # == Main loop == #
         while dist > tol and maxit > it:
+            t0 = time.time()
 
             # Compute expectations for this iteration
             Vs = self.V, self.Vd, self.Vc
             EV, EVd, EVc = (np.dot(self.Py, v) for v in Vs)
+            t1 = time.time()
 
             # Run inner loop to update value functions Vc and Vd. 
             # Note that Vc and Vd are updated in place.  Other objects
             # are not modified.
-            _inner_loop(self.ygrid, self.def_y, self.Bgrid, self.Vd, self.Vc, 
-                    EVc, EVd, EV, self.Q, 
-                    self.beta, self.theta, self.gamma)
+            inner_loop(self.ygrid, self.def_y, self.Bgrid, self.Vd, self.Vc,
+                       EVc, EVd, EV, self.Q,
+                       self.beta, self.theta, self.gamma)
+            t2 = time.time()
                                  
             # Update prices
+            if callback is not None:
+                Q_old, default_states_old = self.Q.copy(), default_states
             Vd_compat = np.repeat(self.Vd, self.nB).reshape(self.ny, self.nB)
             default_states = Vd_compat > self.Vc
             self.default_prob[:, :] = np.dot(self.Py, default_states)
             self.Q[:, :] = (1 - self.default_prob)/(1 + self.r)
+            t3 = time.time()
 
             # Update main value function and distance
             V_upd[:, :] = np.maximum(self.Vc, Vd_compat)
@@ -126,24 +233,52 @@ class Arellano_Economy(object):
             self.V[:, :] = V_upd[:, :]
 
             it += 1
-            if it % 25 == 0:
+            if callback is not None:
+                changes = np.sum(default_states != default_states_old)
+                callback({'iteration': it,
+                          'dist': dist,
+                          'Q_dist': np.max(np.abs(self.Q - Q_old)),
+                          'default_changes': int(changes),
+                          'time_expectations': t1 - t0,
+                          'time_bellman': t2 - t1,
+                          'time_prices': t3 - t2,
+                          'time': time.time() - t0})
+            if verbose and it % 25 == 0:
                 print("Running iteration {} with dist of {}".format(it, dist))
 
-        return None
+        return it
+
+
+    def interpolate_from(self, other):
+        """
+        Set V, Vc, Vd and Q by linear interpolation of the solution of
+        another Arellano_Economy, typically one solved on a coarser
+        grid.  Interpolation in y is over log income.
+        """
+        x_old, x_new = other.mc.state_values, self.mc.state_values
+        B_old, B_new = other.Bgrid, self.Bgrid
+
+        self.Vd[:] = np.interp(x_new, x_old, other.Vd)
+        self.Vc[:, :] = _interp_2d(x_old, B_old, other.Vc, x_new, B_new)
+        self.Q[:, :] = _interp_2d(x_old, B_old, other.Q, x_new, B_new)
+        self.V[:, :] = np.maximum(self.Vc, self.Vd[:, None])
 
 
-    def compute_savings_policy(self):
+    def compute_savings_policy(self, method=None, parallel=None):
         """
         Compute optimal savings B' conditional on not defaulting.
         The policy is recorded as an index value in Bgrid.
         """
+        if parallel is None:
+            parallel = self.parallel
+        savings_policy = _get_savings_policy(method or self.method, parallel)
         
         # Allocate memory
         self.next_B_index = np.empty((self.ny, self.nB))
         EV = np.dot(self.Py, self.V) 
 
-        _compute_savings_policy(self.ygrid, self.Bgrid, self.Q, EV,
-                self.gamma, self.beta, self.next_B_index)
+        savings_policy(self.ygrid, self.Bgrid, self.Q, EV,
+                       self.gamma, self.beta, self.next_B_index)
 
 
     def simulate(self, T, y_init=None, B_init=None):
@@ -192,6 +327,123 @@ class Arellano_Economy(object):
                 
         return return_vecs
 
+    def simulate_panel(self, N, T, seed=None, y_init=None, B_init=None,
+                       moments_only=False):
+        """
+        Simulate N independent economies for T periods each.  The
+        timing conventions are the same as in simulate, but all paths
+        are generated by a single compiled loop.
+
+        Parameters
+        ----------
+        N : int
+            Number of economies
+        T : int
+            Length of each path
+        seed : int, optional(default=None)
+            Seed for the random number generator.  Use this for
+            reproducible panels.
+        y_init, B_init : int, optional
+            Initial indices into ygrid and Bgrid, shared by all paths.
+            The defaults are the same as in simulate.
+        moments_only : bool, optional(default=False)
+            If True, the paths are not stored and only a dictionary of
+            summary moments is returned.
+
+        Returns
+        -------
+        y_sim, B_sim, q_sim, default_status : array_like
+            Arrays of shape (N, T).  Only returned if moments_only is
+            False.
+        moments : dict
+            Only returned if moments_only is True.  Contains
+            'default_freq', the number of defaults per period with
+            market access, 'spread_mean' and 'spread_std', the mean and
+            standard deviation of the spread 1/q - (1 + r), and
+            'debt_gdp', the mean of -B'/y.  Spreads and debt/GDP are
+            computed over periods in which the government repays, and
+            are nan if there are no such periods.
+
+        """
+        zero_B_index = np.searchsorted(self.Bgrid, 0)
+        if y_init is None:
+            y_init = np.searchsorted(self.ygrid, self.ygrid.mean())
+        if B_init is None:
+            B_init = zero_B_index
+
+        shape = (0, 0) if moments_only else (N, T)
+        y_indices = np.empty(shape, dtype=np.int64)
+        B_indices = np.empty(shape, dtype=np.int64)
+        q_sim = np.empty(shape)
+        default_status = np.zeros(shape, dtype=np.int64)
+
+        sums = _simulate_panel(np.cumsum(self.Py, axis=1), self.ygrid,
+                               self.Bgrid, self.Vc, self.Vd, self.Q,
+                               self.next_B_index, self.r, self.theta,
+                               N, T, y_init, B_init, zero_B_index,
+                               -1 if seed is None else seed,
+                               y_indices, B_indices, q_sim, default_status)
+
+        if moments_only:
+            n_access, n_default, n_repay, s_sum, s_sumsq, d_sum = sums
+            moments = {'default_freq': np.nan, 'spread_mean': np.nan,
+                       'spread_std': np.nan, 'debt_gdp': np.nan}
+            if n_access > 0:
+                moments['default_freq'] = n_default / n_access
+            if n_repay > 0:
+                spread_mean = s_sum / n_repay
+                # Round-off can make the variance slightly negative
+                spread_var = s_sumsq / n_repay - spread_mean**2
+                moments['spread_mean'] = spread_mean
+                moments['spread_std'] = np.sqrt(max(spread_var, 0.0))
+                moments['debt_gdp'] = d_sum / n_repay
+            return moments
+
+        return (self.ygrid[y_indices], self.Bgrid[B_indices], q_sim,
+                default_status)
+
+
+def _interp_2d(x_old, y_old, Z, x_new, y_new):
+    """
+    Bilinear interpolation of the array Z, defined on the grid
+    x_old x y_old, onto the grid x_new x y_new.
+    """
+    Z_y = np.empty((len(x_old), len(y_new)))
+    for i in range(len(x_old)):
+        Z_y[i, :] = np.interp(y_new, y_old, Z[i, :])
+    Z_new = np.empty((len(x_new), len(y_new)))
+    for j in range(len(y_new)):
+        Z_new[:, j] = np.interp(x_new, x_old, Z_y[:, j])
+    return Z_new
+
+
+class ConvergenceRecorder(object):
+    """
+    A callback for Arellano_Economy.solve that stores the diagnostics
+    reported at each iteration.
+
+    Examples
+    --------
+    >>> rec = ConvergenceRecorder()
+    >>> ae = Arellano_Economy(verbose=False, callback=rec)
+    >>> rec['dist']           # sup norm distance at each iteration
+    >>> rec['time_bellman'].sum()
+
+    """
+
+    def __init__(self):
+        self.history = []
+
+    def __call__(self, info):
+        self.history.append(info)
+
+    def __len__(self):
+        return len(self.history)
+
+    def __getitem__(self, key):
+        "Return the values recorded under key as an array"
+        return np.array([info[key] for info in self.history])
+
 
 @jit(nopython=True)
 def u(c, gamma):
@@ -247,3 +499,246 @@ def _compute_savings_policy(ygrid, Bgrid, Q, EV, gamma, beta, next_B_index):
             next_B_index[iy, ib] = current_max_index
     return None
 
+
+def _get_inner_loop(method, parallel=False):
+    if method == 'brute_force':
+        return _inner_loop_parallel if parallel else _inner_loop
+    elif method == 'monotone':
+        if parallel:
+            return _inner_loop_monotone_parallel
+        return _inner_loop_monotone
+    else:
+        raise ValueError("method must be 'brute_force' or 'monotone'")
+
+
+def _get_savings_policy(method, parallel=False):
+    if method == 'brute_force':
+        if parallel:
+            return _compute_savings_policy_parallel
+        return _compute_savings_policy
+    elif method == 'monotone':
+        if parallel:
+            return _compute_savings_policy_monotone_parallel
+        return _compute_savings_policy_monotone
+    else:
+        raise ValueError("method must be 'brute_force' or 'monotone'")
+
+
+@jit(nopython=True)
+def _max_over_range(y, B, Bgrid, q, EV, beta, gamma, lo, hi):
+    """
+    Maximize u(y - q[j] * Bgrid[j] + B) + beta * EV[j] over the indices
+    j = lo, ..., hi and return the maximal value and its index.
+    """
+    current_max = -1e14
+    current_max_index = lo
+    for ib_next in range(lo, hi + 1):
+        c = max(y - q[ib_next] * Bgrid[ib_next] + B, 1e-14)
+        m = u(c, gamma) + beta * EV[ib_next]
+        if m > current_max:
+            current_max = m
+            current_max_index = ib_next
+    return current_max, current_max_index
+
+
+@jit(nopython=True)
+def _monotone_row(y, Bgrid, q, EV, beta, gamma, V_row, index_row):
+    """
+    Maximize over B' for every B in Bgrid, given income y, prices q and
+    expected values EV along the B' dimension.  Since the optimal index
+    is nondecreasing in B, the choice at a midpoint of Bgrid only needs
+    to be searched for between the choices at the end points of the
+    bracket.  Values are written to V_row and argmax indices to
+    index_row.
+    """
+    nB = len(Bgrid)
+    V_row[0], index_row[0] = _max_over_range(y, Bgrid[0], Bgrid, q, EV,
+                                             beta, gamma, 0, nB - 1)
+    V_row[nB-1], index_row[nB-1] = _max_over_range(y, Bgrid[nB-1], Bgrid,
+                                                   q, EV, beta, gamma,
+                                                   index_row[0], nB - 1)
+
+    # Stack of brackets (lo, hi) whose interior is still to be solved
+    brackets = np.empty((nB, 2), dtype=np.int64)
+    brackets[0, 0], brackets[0, 1] = 0, nB - 1
+    top = 1
+    while top > 0:
+        top -= 1
+        lo, hi = brackets[top, 0], brackets[top, 1]
+        if hi - lo < 2:
+            continue
+        mid = (lo + hi) // 2
+        V_row[mid], index_row[mid] = \
+            _max_over_range(y, Bgrid[mid], Bgrid, q, EV, beta, gamma,
+                            int(index_row[lo]), int(index_row[hi]))
+        brackets[top, 0], brackets[top, 1] = lo, mid
+        brackets[top+1, 0], brackets[top+1, 1] = mid, hi
+        top += 2
+
+    return None
+
+
+@jit(nopython=True)
+def _inner_loop_monotone(ygrid, def_y, Bgrid, Vd, Vc, EVc,
+                         EVd, EV, qq, beta, theta, gamma):
+    """
+    Same as _inner_loop, but the maximization over B' uses the
+    monotonicity of the savings policy.  Updates Vd and Vc in place.
+    """
+    ny, nB = len(ygrid), len(Bgrid)
+    zero_ind = nB // 2  # Integer division
+    index_row = np.empty(nB, dtype=np.int64)
+    for iy in range(ny):
+        Vd[iy] = u(def_y[iy], gamma) + \
+                beta * (theta * EVc[iy, zero_ind] + (1 - theta) * EVd[iy])
+        _monotone_row(ygrid[iy], Bgrid, qq[iy, :], EV[iy, :], beta, gamma,
+                      Vc[iy, :], index_row)
+
+    return None
+
+
+@jit(nopython=True)
+def _compute_savings_policy_monotone(ygrid, Bgrid, Q, EV, gamma, beta,
+                                     next_B_index):
+    # Same as _compute_savings_policy, using monotonicity in B
+    ny, nB = len(ygrid), len(Bgrid)
+    V_row = np.empty(nB)
+    for iy in range(ny):
+        _monotone_row(ygrid[iy], Bgrid, Q[iy, :], EV[iy, :], beta, gamma,
+                      V_row, next_B_index[iy, :])
+    return None
+
+
+# == Multi-core versions of the loops above == #
+
+@jit(nopython=True, parallel=True)
+def _inner_loop_parallel(ygrid, def_y, Bgrid, Vd, Vc, EVc,
+                         EVd, EV, qq, beta, theta, gamma):
+    """
+    Parallel version of _inner_loop.  The (y, B) pairs are flattened
+    so that the work is balanced across threads even when ny is small
+    relative to the number of cores.  Updates Vd and Vc in place.
+    """
+    ny, nB = len(ygrid), len(Bgrid)
+    zero_ind = nB // 2  # Integer division
+    for iy in range(ny):
+        Vd[iy] = u(def_y[iy], gamma) + \
+                beta * (theta * EVc[iy, zero_ind] + (1 - theta) * EVd[iy])
+
+    for k in prange(ny * nB):
+        iy, ib = k // nB, k % nB
+        Vc[iy, ib], _ = _max_over_range(ygrid[iy], Bgrid[ib], Bgrid,
+                                        qq[iy, :], EV[iy, :], beta, gamma,
+                                        0, nB - 1)
+
+    return None
+
+
+@jit(nopython=True, parallel=True)
+def _inner_loop_monotone_parallel(ygrid, def_y, Bgrid, Vd, Vc, EVc,
+                                  EVd, EV, qq, beta, theta, gamma):
+    """
+    Parallel version of _inner_loop_monotone, with one income state per
+    task.  Updates Vd and Vc in place.
+    """
+    ny, nB = len(ygrid), len(Bgrid)
+    zero_ind = nB // 2  # Integer division
+    index_rows = np.empty((ny, nB), dtype=np.int64)
+    for iy in prange(ny):
+        Vd[iy] = u(def_y[iy], gamma) + \
+                beta * (theta * EVc[iy, zero_ind] + (1 - theta) * EVd[iy])
+        _monotone_row(ygrid[iy], Bgrid, qq[iy, :], EV[iy, :], beta, gamma,
+                      Vc[iy, :], index_rows[iy, :])
+
+    return None
+
+
+@jit(nopython=True, parallel=True)
+def _compute_savings_policy_parallel(ygrid, Bgrid, Q, EV, gamma, beta,
+                                     next_B_index):
+    # Parallel version of _compute_savings_policy
+    ny, nB = len(ygrid), len(Bgrid)
+    for k in prange(ny * nB):
+        iy, ib = k // nB, k % nB
+        _, next_B_index[iy, ib] = \
+            _max_over_range(ygrid[iy], Bgrid[ib], Bgrid, Q[iy, :],
+                            EV[iy, :], beta, gamma, 0, nB - 1)
+    return None
+
+
+@jit(nopython=True, parallel=True)
+def _compute_savings_policy_monotone_parallel(ygrid, Bgrid, Q, EV, gamma,
+                                              beta, next_B_index):
+    # Parallel version of _compute_savings_policy_monotone
+    ny, nB = len(ygrid), len(Bgrid)
+    V_rows = np.empty((ny, nB))
+    for iy in prange(ny):
+        _monotone_row(ygrid[iy], Bgrid, Q[iy, :], EV[iy, :], beta, gamma,
+                      V_rows[iy, :], next_B_index[iy, :])
+    return None
+
+
+@jit(nopython=True)
+def _simulate_panel(Py_cdf, ygrid, Bgrid, Vc, Vd, Q, next_B_index, r, theta,
+                    N, T, y_init, B_init, zero_B_index, seed,
+                    y_indices, B_indices, q_sim, default_status):
+    """
+    Simulate N paths of length T, following the logic of
+    Arellano_Economy.simulate.  Paths are written into the output arrays
+    when they have N rows, and otherwise only the running sums used for
+    summary moments are kept.  A negative seed leaves the state of the
+    random number generator untouched.
+    """
+    if seed >= 0:
+        np.random.seed(seed)
+    store = y_indices.shape[0] == N
+    ny = len(ygrid)
+    n_access, n_default, n_repay = 0, 0, 0
+    s_sum, s_sumsq, d_sum = 0.0, 0.0, 0.0
+
+    for i in range(N):
+        yi, Bi = y_init, B_init
+        in_default = False
+        q = 0.0
+        for t in range(T):
+            if store:
+                y_indices[i, t], B_indices[i, t] = yi, Bi
+            if t == T - 1:
+                break
+            repays = False
+            if not in_default:
+                n_access += 1
+                if Vc[yi, Bi] < Vd[yi]:
+                    in_default = True
+                    n_default += 1
+                    Bi_next = zero_B_index
+                else:
+                    repays = True
+                    Bi_next = int(next_B_index[yi, Bi])
+            else:
+                if store:
+                    default_status[i, t] = 1
+                Bi_next = zero_B_index
+                if np.random.random() < theta:
+                    in_default = False
+            q = Q[yi, Bi_next]
+            if store:
+                q_sim[i, t] = q
+            if repays:
+                n_repay += 1
+                spread = 1 / q - (1 + r)
+                s_sum += spread
+                s_sumsq += spread**2
+                d_sum += -Bgrid[Bi_next] / ygrid[yi]
+
+            # Draw next period income
+            U = np.random.random()
+            yi_next = 0
+            while yi_next < ny - 1 and U > Py_cdf[yi, yi_next]:
+                yi_next += 1
+            yi, Bi = yi_next, Bi_next
+
+        if store:
+            q_sim[i, T-1] = q  # Extrapolate for the last price
+
+    return n_access, n_default, n_repay, s_sum, s_sumsq, d_sum
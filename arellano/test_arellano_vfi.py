@@ -0,0 +1,84 @@
+"""
+Tests for arellano_vfi
+
+"""
+from __future__ import division
+import unittest
+import numpy as np
+from arellano_vfi import Arellano_Economy, ConvergenceRecorder
+
+# small grid, so that the brute force solution is quick
+ny, nB = 11, 101
+tol = 1e-8
+
+
+class TestArellanoEconomy(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.rec = ConvergenceRecorder()
+        cls.ae = Arellano_Economy(ny=ny, nB=nB, tol=tol, verbose=False,
+                                  callback=cls.rec)
+
+    def _assert_same_solution(self, other):
+        np.testing.assert_array_equal(other.V, self.ae.V)
+        np.testing.assert_array_equal(other.Q, self.ae.Q)
+        np.testing.assert_array_equal(other.next_B_index,
+                                      self.ae.next_B_index)
+
+    def test_monotone(self):
+        "arellano: monotone search reproduces brute force"
+        ae = Arellano_Economy(ny=ny, nB=nB, tol=tol, verbose=False,
+                              method='monotone')
+        self._assert_same_solution(ae)
+
+    def test_parallel(self):
+        "arellano: parallel sweep reproduces brute force"
+        ae = Arellano_Economy(ny=ny, nB=nB, tol=tol, verbose=False,
+                              parallel=True)
+        self._assert_same_solution(ae)
+
+    def test_parallel_monotone(self):
+        "arellano: parallel monotone search reproduces brute force"
+        ae = Arellano_Economy(ny=ny, nB=nB, tol=tol, verbose=False,
+                              method='monotone', parallel=True)
+        self._assert_same_solution(ae)
+
+    def test_callback(self):
+        "arellano: callback records each iteration"
+        n = len(self.rec)
+        np.testing.assert_array_equal(self.rec['iteration'],
+                                      np.arange(1, n + 1))
+        self.assertLess(self.rec['dist'][-1], tol)
+        self.assertTrue((self.rec['dist'][:-1] >= tol).all())
+
+    def test_coarse_grids(self):
+        "arellano: coarse grid continuation matches the direct solve"
+        rec = ConvergenceRecorder()
+        ae = Arellano_Economy(ny=ny, nB=nB, tol=tol, verbose=False,
+                              callback=rec,
+                              coarse_grids=[(5, 26), (ny, 51)])
+        np.testing.assert_array_equal(ae.next_B_index, self.ae.next_B_index)
+        np.testing.assert_allclose(ae.V, self.ae.V, atol=1e-6)
+
+        # Only iterations on the target grid reach the callback
+        n = len(rec)
+        np.testing.assert_array_equal(rec['iteration'], np.arange(1, n + 1))
+        self.assertLess(rec['dist'][-1], tol)
+        self.assertLess(n, len(self.rec))
+
+    def test_simulate_panel_seed(self):
+        "arellano: simulate_panel is reproducible for a fixed seed"
+        paths = self.ae.simulate_panel(50, 100, seed=1234)
+        same = self.ae.simulate_panel(50, 100, seed=1234)
+        for x, y in zip(paths, same):
+            np.testing.assert_array_equal(x, y)
+        for x in paths:
+            self.assertEqual(x.shape, (50, 100))
+
+        moments = self.ae.simulate_panel(50, 100, seed=1234,
+                                         moments_only=True)
+        self.assertEqual(moments, self.ae.simulate_panel(50, 100, seed=1234,
+                                                         moments_only=True))
+        self.assertTrue(0 <= moments['default_freq'] <= 1)
+        self.assertTrue(moments['spread_std'] >= 0)
@@ -94,7 +94,19 @@ class CareerWorkerProblem(object):
         return dedent(m.format(b=self.beta, B=self.B, n=self.N, fa=self._F_a,
                                fb=self._F_b, ga=self._G_a, gb=self._G_b))
 
-    def bellman_operator(self, v):
+    def _choice_values(self, v):
+        """
+        The values of the three actions at every (theta_i, epsilon_j),
+        given v.  v1 is an array of shape v.shape, v2 is a column that
+        depends only on theta_i and v3 is a scalar.
+        """
+        Ev = np.dot(v, self.G_probs)
+        v1 = self.theta[:, None] + self.epsilon + self.beta * v
+        v2 = (self.theta + self.G_mean + self.beta * Ev)[:, None]
+        v3 = self.G_mean + self.F_mean + self.beta * np.dot(self.F_probs, Ev)
+        return v1, v2, v3
+
+    def bellman_operator(self, v, return_policy=False):
         """
         The Bellman operator for the career / job choice model of Neal.
 
@@ -103,29 +115,30 @@ class CareerWorkerProblem(object):
         v : array_like(float)
             A 2D NumPy array representing the value function
             Interpretation: :math:`v[i, j] = v(\theta_i, \epsilon_j)`
+        return_policy : bool, optional(default=False)
+            If True, also return the greedy policy computed from the same
+            choice values, as in get_greedy
 
         Returns
         -------
         new_v : array_like(float)
             The updated value function Tv as an array of shape v.shape
+        policy : array_like(int)
+            The greedy policy, only returned if return_policy is True
 
         """
-        new_v = np.empty(v.shape)
-        for i in range(self.N):
-            for j in range(self.N):
-                # stay put
-                v1 = self.theta[i] + self.epsilon[j] + self.beta * v[i, j]
-
-                # new job
-                v2 = (self.theta[i] + self.G_mean + self.beta *
-                      np.dot(v[i, :], self.G_probs))
-
-                # new life
-                v3 = (self.G_mean + self.F_mean + self.beta *
-                      np.dot(self.F_probs, np.dot(v, self.G_probs)))
-                new_v[i, j] = max(v1, v2, v3)
+        v1, v2, v3 = self._choice_values(v)
+        new_v = np.maximum(np.maximum(v1, v2), v3)
+        if return_policy:
+            return new_v, self._greedy(v1, v2, v3)
         return new_v
 
+    def _greedy(self, v1, v2, v3):
+        policy = np.full(v1.shape, 3, dtype=int)
+        policy[v2 > np.maximum(v1, v3)] = 2
+        policy[v1 > np.maximum(v2, v3)] = 1
+        return policy
+
     def get_greedy(self, v):
         """
         Compute optimal actions taking v as the value function.
@@ -147,20 +160,149 @@ class CareerWorkerProblem(object):
             life'
 
         """
-        policy = np.empty(v.shape, dtype=int)
-        for i in range(self.N):
-            for j in range(self.N):
-                v1 = self.theta[i] + self.epsilon[j] + self.beta * v[i, j]
-                v2 = (self.theta[i] + self.G_mean + self.beta *
-                      np.dot(v[i, :], self.G_probs))
-                v3 = (self.G_mean + self.F_mean + self.beta *
-                      np.dot(self.F_probs, np.dot(v, self.G_probs)))
-                if v1 > max(v2, v3):
-                    action = 1
-                elif v2 > max(v1, v3):
-                    action = 2
-                else:
-                    action = 3
-                policy[i, j] = action
+        return self._greedy(*self._choice_values(v))
 
-        return policy
+    def evaluate_policy(self, policy):
+        """
+        Compute the value of following a fixed policy forever.
+
+        The linear system for v has a product structure.  A worker who
+        stays put earns (theta_i + epsilon_j) / (1 - beta).  The values
+        of new job and new life cells depend on v only through the row
+        means m_i = sum_j G_j v[i, j] and their F-weighted average M, so
+        the system reduces to N scalar equations that are linear in M,
+        and is solved in O(N^2) operations.
+
+        Parameters
+        ----------
+        policy : array_like(int)
+            A 2D NumPy array of actions in {1, 2, 3}, as returned by
+            get_greedy
+
+        Returns
+        -------
+        v : array_like(float)
+            The value function of the policy, as an array of shape
+            policy.shape
+
+        """
+        beta, G_probs = self.beta, self.G_probs
+        theta, epsilon = self.theta[:, None], self.epsilon
+        stay = (theta + epsilon) / (1 - beta)
+        c2, c3 = theta + self.G_mean, self.G_mean + self.F_mean
+
+        # m_i = p_i + q_i M
+        g2 = np.dot(policy == 2, G_probs)
+        g3 = np.dot(policy == 3, G_probs)
+        a = np.dot(np.where(policy == 1, stay, 0), G_probs) + g2 * c2[:, 0]
+        p = (a + g3 * c3) / (1 - beta * g2)
+        q = beta * g3 / (1 - beta * g2)
+        M = np.dot(self.F_probs, p) / (1 - np.dot(self.F_probs, q))
+        m = p + q * M
+
+        v = np.where(policy == 1, stay, c3 + beta * M)
+        return np.where(policy == 2, c2 + beta * m[:, None], v)
+
+    def policy_iteration(self, v_init=None, max_iter=100):
+        """
+        Solve the model by Howard's policy iteration, alternating
+        get_greedy and evaluate_policy until the policy stops changing.
+
+        Parameters
+        ----------
+        v_init : array_like(float), optional(default=None)
+            The value function used to compute the initial policy.  If
+            None, the policy is greedy with respect to zeros
+        max_iter : scalar(int), optional(default=100)
+            Maximum number of policy updates
+
+        Returns
+        -------
+        v : array_like(float)
+            The value function of the final policy
+        policy : array_like(int)
+            The final policy, with actions coded as in get_greedy
+        num_iter : scalar(int)
+            The number of policy evaluations performed
+
+        """
+        if v_init is None:
+            v_init = np.zeros((self.N, self.N))
+        policy = self.get_greedy(v_init)
+        for num_iter in range(1, max_iter + 1):
+            v = self.evaluate_policy(policy)
+            new_policy = self.get_greedy(v)
+            if (new_policy == policy).all():
+                break
+            policy = new_policy
+        return v, policy, num_iter
+
+    def simulate(self, policy, num_workers=10000, T=200, theta_init=0,
+                 epsilon_init=0, seed=None):
+        """
+        Simulate many workers at once under a fixed policy, recording
+        how long each takes to settle into a permanent job.
+
+        Workers who choose to stay put never move again, so they are
+        dropped from the simulation when they settle and only the
+        workers still searching are advanced.  Individual paths are not
+        stored.
+
+        Parameters
+        ----------
+        policy : array_like(int)
+            A 2D NumPy array of actions in {1, 2, 3}, as returned by
+            get_greedy
+        num_workers : scalar(int), optional(default=10000)
+            Number of workers
+        T : scalar(int), optional(default=200)
+            Number of periods to simulate
+        theta_init, epsilon_init : scalar(int), optional(default=0)
+            Indices of the initial career and job of every worker
+        seed : scalar(int), optional(default=None)
+            Seed for the random number generator
+
+        Returns
+        -------
+        passage_times : array_like(int)
+            The period in which each worker first chooses to stay put,
+            or -1 if this does not happen within T periods
+        occupancy : array_like(float)
+            occupancy[i, j] is the fraction of worker-periods spent at
+            (theta_i, epsilon_j)
+
+        """
+        N = self.N
+        random_state = np.random.RandomState(seed)
+        F_cdf, G_cdf = np.cumsum(self.F_probs), np.cumsum(self.G_probs)
+
+        passage_times = np.full(num_workers, -1, dtype=int)
+        counts = np.zeros(N * N)
+        active = np.arange(num_workers)
+        i = np.full(num_workers, theta_init, dtype=int)
+        j = np.full(num_workers, epsilon_init, dtype=int)
+
+        for t in range(T):
+            if active.size == 0:
+                break
+            state = i * N + j
+            counts += np.bincount(state, minlength=N*N)
+            action = policy[i, j]
+
+            # settled workers occupy the same state until T
+            settled = action == 1
+            passage_times[active[settled]] = t
+            counts += np.bincount(state[settled], minlength=N*N) * (T-t-1)
+
+            searching = ~settled
+            active, action = active[searching], action[searching]
+            i, j = i[searching], j[searching]
+
+            new_life = action == 3
+            u = random_state.random_sample(new_life.sum())
+            i[new_life] = np.minimum(np.searchsorted(F_cdf, u), N - 1)
+            u = random_state.random_sample(active.size)
+            j = np.minimum(np.searchsorted(G_cdf, u), N - 1)
+
+        occupancy = counts.reshape(N, N) / (num_workers * T)
+        return passage_times, occupancy
@@ -46,3 +46,53 @@ class TestCareerWorkerProblem(unittest.TestCase):
             # if we ever want to stay put, it will be with best possible
             # theta and best epsilon
             assert self.greedy[-1, -1] == 1
+
+    def test_bellman_return_policy(self):
+        "career: bellman return_policy matches get_greedy"
+        v_prime, policy = self.cp.bellman_operator(self.v_init,
+                                                   return_policy=True)
+        assert np.allclose(v_prime, self.v_prime)
+        assert (policy == self.greedy).all()
+
+    def test_bellman_loop_agrees(self):
+        "career: array bellman matches a loop over (theta, epsilon)"
+        cp, v = self.cp, self.v_init
+        v3 = (cp.G_mean + cp.F_mean + cp.beta *
+              np.dot(cp.F_probs, np.dot(v, cp.G_probs)))
+        for i in range(cp.N):
+            v2 = cp.theta[i] + cp.G_mean + cp.beta * np.dot(v[i, :],
+                                                            cp.G_probs)
+            for j in range(cp.N):
+                v1 = cp.theta[i] + cp.epsilon[j] + cp.beta * v[i, j]
+                assert np.allclose(self.v_prime[i, j], max(v1, v2, v3))
+
+    def test_policy_iteration_fp(self):
+        "career: policy iteration gives a fixed point of the bellman op"
+        v, policy, num_iter = self.cp.policy_iteration()
+        assert num_iter < 20
+        assert np.allclose(self.cp.bellman_operator(v), v)
+        assert (self.cp.get_greedy(v) == policy).all()
+
+    def test_evaluate_policy(self):
+        "career: evaluate_policy solves v = r_sigma + beta P_sigma v"
+        cp = self.cp
+        v = cp.evaluate_policy(self.greedy)
+        v1, v2, v3 = cp._choice_values(v)
+        v2, v3 = v2 + 0 * v1, v3 + 0 * v1
+        Tv = np.choose(self.greedy - 1, [v1, v2, v3])
+        assert np.allclose(Tv, v)
+
+    def test_simulate(self):
+        "career: simulated passage times and occupancy"
+        v, policy, num_iter = self.cp.policy_iteration()
+        T = 100
+        times, occupancy = self.cp.simulate(policy, num_workers=500, T=T,
+                                            seed=42)
+        assert times.shape == (500,)
+        assert ((times >= -1) & (times < T)).all()
+        assert np.allclose(occupancy.sum(), 1)
+        # settled workers are only ever found where the policy is 1
+        assert occupancy[policy == 1].sum() > 0.5
+        times_2, occupancy_2 = self.cp.simulate(policy, num_workers=500,
+                                                T=T, seed=42)
+        assert (times == times_2).all()
@@ -13,9 +13,17 @@ References
 http://quant-econ.net/py/ifp.html
 
 """
+import time
+from multiprocessing import Pool
 import numpy as np
 from scipy.optimize import fminbound, brentq
 from scipy import interp
+from numba import jit
+
+
+def _log_du(x):
+    "Marginal utility for log utility, which is also its own inverse"
+    return 1 / x
 
 
 class ConsumerProblem(object):
@@ -48,10 +56,14 @@ class ConsumerProblem(object):
         The utility function
     du : callable, optional(default=lambda x: 1/x)
         The derivative of u
+    du_inv : callable, optional(default=None)
+        The inverse of du, used by the endogenous grid method.  If None
+        and du is the default, this is lambda x: 1/x.  It must be given
+        to use the endogenous grid method with any other du.
 
     Attributes
     ----------
-    r, beta, Pi, z_vals, b, u, du : see Parameters
+    r, beta, Pi, z_vals, b, u, du, du_inv : see Parameters
     asset_grid : np.ndarray
         One dimensional grid for assets
 
@@ -59,15 +71,17 @@ class ConsumerProblem(object):
 
     def __init__(self, r=0.01, beta=0.96, Pi=((0.6, 0.4), (0.05, 0.95)),
                  z_vals=(0.5, 1.0), b=0, grid_max=16, grid_size=50,
-                 u=np.log, du=lambda x: 1/x):
-        self.u, self.du = u, du
+                 u=np.log, du=_log_du, du_inv=None):
+        if du_inv is None and du is _log_du:
+            du_inv = _log_du
+        self.u, self.du, self.du_inv = u, du, du_inv
         self.r, self.R = r, 1 + r
         self.beta, self.b = beta, b
         self.Pi, self.z_vals = np.array(Pi), tuple(z_vals)
         self.asset_grid = np.linspace(-b, grid_max, grid_size)
 
 
-    def bellman_operator(self, V, return_policy=False):
+    def bellman_operator(self, V, return_policy=False, method='fminbound'):
         """
         The approximate Bellman operator, which computes and returns the
         updated value function TV (or the V-greedy policy c if
@@ -80,6 +94,10 @@ class ConsumerProblem(object):
         return_policy : bool, optional(default=False)
             Indicates whether to return the greed policy given V or the
             updated value function TV.  Default is TV.
+        method : str, optional(default='fminbound')
+            If 'fminbound', maximize separately at each grid point with
+            scipy's fminbound.  If 'golden', maximize at all grid points
+            at once with golden_bellman.
 
         Returns
         -------
@@ -88,6 +106,12 @@ class ConsumerProblem(object):
             function TV.
 
         """
+        if method == 'golden':
+            new_V, new_c = self.golden_bellman(V)
+            return new_c if return_policy else new_V
+        elif method != 'fminbound':
+            raise ValueError("method must be 'fminbound' or 'golden'")
+
         # === Simplify names, set up arrays === #
         R, Pi, beta, u, b = self.R, self.Pi, self.beta, self.u, self.b
         asset_grid, z_vals = self.asset_grid, self.z_vals
@@ -112,6 +136,62 @@ class ConsumerProblem(object):
         else:
             return new_V
 
+    def golden_bellman(self, V, tol=1e-8):
+        """
+        The approximate Bellman operator, maximizing over consumption at
+        every (a, z) grid point simultaneously by golden section search.
+        Each step of the search evaluates the objective for all grid
+        points with one vectorized call, so the cost per step is that
+        of interpolating V at len(asset_grid) * len(z_vals) points for
+        each z'.  The utility function must accept arrays.
+
+        Parameters
+        ----------
+        V : array_like(float)
+            A NumPy array of dim len(cp.asset_grid) times len(cp.z_vals)
+        tol : scalar(float), optional(default=1e-8)
+            The search stops when the bracket around each maximizer is
+            shorter than tol
+
+        Returns
+        -------
+        new_V : array_like(float)
+            The updated value function TV
+        new_c : array_like(float)
+            The V-greedy consumption policy
+
+        """
+        # === Simplify names, set up arrays === #
+        R, Pi, beta, u, b = self.R, self.Pi, self.beta, self.u, self.b
+        asset_grid, z_vals = self.asset_grid, np.asarray(self.z_vals)
+        a, z = asset_grid[:, None], z_vals[None, :]
+
+        def obj(c):  # objective function to be *maximized*
+            y = sum(interp(R * a + z - c, asset_grid, V[:, j]) * Pi[:, j]
+                    for j in range(len(z_vals)))
+            return u(c) + beta * y
+
+        # === golden section search on [1e-8, R a + z + b] === #
+        invphi = (np.sqrt(5) - 1) / 2
+        lo = np.full(V.shape, 1e-8)
+        hi = R * a + z + b + np.zeros(V.shape)
+        num_steps = int(np.ceil(np.log(tol / np.max(hi - lo)) /
+                                np.log(invphi)))
+        x1, x2 = hi - invphi * (hi - lo), lo + invphi * (hi - lo)
+        f1, f2 = obj(x1), obj(x2)
+        for i in range(num_steps):
+            move_up = f1 < f2  # maximizer lies in [x1, hi]
+            lo, hi = np.where(move_up, x1, lo), np.where(move_up, hi, x2)
+            x_new = np.where(move_up, lo + invphi * (hi - lo),
+                             hi - invphi * (hi - lo))
+            f_new = obj(x_new)
+            x1, x2 = np.where(move_up, x2, x_new), np.where(move_up, x_new, x1)
+            f1, f2 = np.where(move_up, f2, f_new), np.where(move_up, f_new, f1)
+
+        new_c = np.where(f1 > f2, x1, x2)
+        new_V = np.maximum(f1, f2)
+        return new_V, new_c
+
     def coleman_operator(self, c):
         """
         The approximate Coleman operator.
@@ -164,6 +244,71 @@ class ConsumerProblem(object):
 
         return Kc
 
+    def egm_operator(self, c):
+        """
+        The Coleman operator computed by the endogenous grid method.
+
+        The asset grid is also used as the grid for next period assets
+        a', so the expectation on the right hand side of the Euler
+        equation only requires c at grid points.  Inverting the Euler
+        equation gives consumption, and hence current assets, at which
+        each a' is optimal, and the new policy is recovered by linear
+        interpolation onto the asset grid.  No root finding is
+        required.  Where the borrowing constraint binds, c = R a + z + b.
+
+        Parameters
+        ----------
+        c : array_like(float)
+            A NumPy array of dim len(cp.asset_grid) times len(cp.z_vals)
+
+        Returns
+        -------
+        array_like(float)
+            The updated policy, on the same grid as c
+
+        """
+        if self.du_inv is None:
+            raise ValueError("du_inv must be given when du is not the "
+                             "default")
+
+        # === simplify names, set up arrays === #
+        R, Pi, beta, du, du_inv = self.R, self.Pi, self.beta, self.du, \
+            self.du_inv
+        asset_grid, z_vals = self.asset_grid, np.asarray(self.z_vals)
+
+        # === invert the Euler equation at each (a', z) === #
+        c_endog = du_inv(R * beta * np.dot(du(c), Pi.T))
+        a_endog = (asset_grid[:, None] + c_endog - z_vals) / R
+
+        # === interpolate back onto the asset grid === #
+        Kc = np.empty(c.shape)
+        for i_z, z in enumerate(z_vals):
+            x, y = a_endog[:, i_z], c_endog[:, i_z]
+            Kc[:, i_z] = np.interp(asset_grid, x, y)
+            # linear extrapolation above the largest endogenous point
+            above = asset_grid > x[-1]
+            slope = (y[-1] - y[-2]) / (x[-1] - x[-2])
+            Kc[above, i_z] = y[-1] + slope * (asset_grid[above] - x[-1])
+
+        # === the borrowing constraint binds below a_endog[0] === #
+        c_max = R * asset_grid[:, None] + z_vals + self.b
+        return np.minimum(Kc, c_max)
+
+    def solve_egm(self, c_init=None, tol=1e-8, max_iter=1000):
+        """
+        Compute the optimal consumption policy by iterating with
+        egm_operator, starting from c_init (the second output of
+        initialize by default), until the sup norm change is below tol.
+
+        Returns
+        -------
+        c : array_like(float)
+            The approximate optimal consumption policy
+
+        """
+        c = self.initialize()[1] if c_init is None else c_init
+        return _iterate(self.egm_operator, c, tol, max_iter)[0]
+
     def initialize(self):
         """
         Creates a suitable initial conditions V and c for value function
@@ -191,3 +336,248 @@ class ConsumerProblem(object):
                 V[i_a, i_z] = u(c_max) / (1 - beta)
 
         return V, c
+
+
+def _iterate(T, c, tol, max_iter):
+    """
+    Iterate with the operator T from c until the sup norm change is
+    below tol.  Returns the final iterate and the number of iterations.
+    """
+    for i in range(max_iter):
+        new_c = T(c)
+        error = np.max(np.abs(new_c - c))
+        c = new_c
+        if error < tol:
+            break
+    return c, i + 1
+
+
+def solve_batch(r_vals, beta_vals=None, method='egm', tol=1e-8,
+                max_iter=1000, processes=None, **kwargs):
+    """
+    Compute the optimal consumption policy of ConsumerProblem for each
+    of a sequence of interest rates (and, optionally, discount
+    factors).  The parameters are solved in the order given, each
+    starting from an extrapolation of the solutions for the previous
+    ones, so neighbouring values should be close together.
+
+    Parameters
+    ----------
+    r_vals : array_like(float)
+        Interest rates
+    beta_vals : array_like(float), optional(default=None)
+        Discount factors, paired with r_vals.  If None, every problem
+        uses the beta in kwargs, or the ConsumerProblem default.
+    method : str, optional(default='egm')
+        Either 'egm' to iterate with egm_operator or 'coleman' to
+        iterate with coleman_operator
+    tol : scalar(float), optional(default=1e-8)
+        Tolerance for the sup norm change in the policy
+    max_iter : scalar(int), optional(default=1000)
+        Maximum number of iterations for each problem
+    processes : scalar(int), optional(default=None)
+        If given, the parameters are split into this many contiguous
+        blocks, which are solved in a process pool, warm starting
+        within each block.  The kwargs must then be picklable, so
+        custom u, du and du_inv should be module level functions.
+    kwargs
+        Further keyword arguments passed to ConsumerProblem
+
+    Returns
+    -------
+    c : array_like(float)
+        The policies, of shape (len(r_vals), grid_size, len(z_vals))
+    num_iter : array_like(int)
+        The number of iterations used for each problem
+    times : array_like(float)
+        The wall time spent on each problem, in seconds
+
+    """
+    if method not in ['egm', 'coleman']:
+        raise ValueError("method must be 'egm' or 'coleman'")
+    r_vals = np.atleast_1d(r_vals)
+    if beta_vals is None:
+        beta_vals = [ConsumerProblem(**kwargs).beta] * len(r_vals)
+        kwargs.pop('beta', None)
+    elif 'beta' in kwargs:
+        raise ValueError("pass either beta_vals or beta, not both")
+    elif len(beta_vals) != len(r_vals):
+        raise ValueError("r_vals and beta_vals must have the same length")
+    params = list(zip(r_vals, beta_vals))
+
+    if processes is None:
+        results = [_solve_block(params, method, tol, max_iter, kwargs)]
+    else:
+        blocks = [[params[i] for i in idx] for idx in
+                  np.array_split(np.arange(len(params)), processes)]
+        args = [(block, method, tol, max_iter, kwargs)
+                for block in blocks if block]
+        pool = Pool(processes)
+        try:
+            results = pool.map(_solve_block_star, args)
+        finally:
+            pool.close()
+            pool.join()
+
+    c = np.concatenate([res[0] for res in results])
+    num_iter = np.concatenate([res[1] for res in results])
+    times = np.concatenate([res[2] for res in results])
+    return c, num_iter, times
+
+
+def _solve_block(params, method, tol, max_iter, kwargs):
+    """
+    Solve for each (r, beta) in params in turn.  Each problem starts
+    from a linear extrapolation of the previous two solutions along the
+    parameter path, or from the previous solution alone for the second.
+    """
+    policies, num_iter, times = [], [], []
+    for k, (r, beta) in enumerate(params):
+        start = time.time()
+        cp = ConsumerProblem(r=r, beta=beta, **kwargs)
+        if k == 0:
+            c = cp.initialize()[1]
+        elif k == 1:
+            c = policies[-1]
+        else:
+            step = np.subtract(params[k], params[k-1])
+            prev_step = np.subtract(params[k-1], params[k-2])
+            size = np.dot(prev_step, prev_step)
+            w = np.dot(step, prev_step) / size if size > 0 else 0.0
+            c = policies[-1] + w * (policies[-1] - policies[-2])
+            a, z = cp.asset_grid[:, None], np.asarray(cp.z_vals)
+            c = np.clip(c, 1e-8, cp.R * a + z + cp.b)
+        T = cp.egm_operator if method == 'egm' else cp.coleman_operator
+        c, n = _iterate(T, c, tol, max_iter)
+        policies.append(c)
+        num_iter.append(n)
+        times.append(time.time() - start)
+    return np.array(policies), np.array(num_iter), np.array(times)
+
+
+def _solve_block_star(args):
+    return _solve_block(*args)
+
+
+def simulate_panel(c, asset_grid, Pi, z_vals, R, num_households=100000,
+                   T=1000, a_init=None, z_init=0, seed=None, bins=None,
+                   quantiles=None):
+    """
+    Simulate the assets of a large panel of households following the
+    consumption policy c, advancing all households together one period
+    at a time.  Only the current cross section is stored, so memory does
+    not grow with T.  Statistics of the cross section are recorded in
+    each period instead.
+
+    Parameters
+    ----------
+    c : array_like(float)
+        A consumption policy, such as the fixed point of
+        coleman_operator, of dim len(asset_grid) times len(z_vals)
+    asset_grid, Pi, z_vals, R : see ConsumerProblem
+    num_households : scalar(int), optional(default=100000)
+        Number of households
+    T : scalar(int), optional(default=1000)
+        Number of periods
+    a_init : scalar(float) or array_like(float), optional(default=None)
+        Initial assets.  The default is asset_grid[0].
+    z_init : scalar(int) or array_like(int), optional(default=0)
+        Initial income states, as indices into z_vals
+    seed : scalar(int), optional(default=None)
+        Seed for the random number generator
+    bins : array_like(float), optional(default=None)
+        If given, bin edges used to record a histogram of assets in
+        each period
+    quantiles : array_like(float), optional(default=None)
+        If given, probabilities at which to record the quantiles of
+        assets in each period
+
+    Returns
+    -------
+    a : array_like(float)
+        Assets of each household at the end of the simulation
+    z : array_like(int)
+        Income state indices at the end of the simulation
+    stats : dict
+        'mean' is an array of length T, with stats['mean'][t] the mean
+        of assets after t + 1 periods.  If requested, 'hist' has shape
+        (T, len(bins) - 1) and holds counts, and 'quantiles' has shape
+        (T, len(quantiles)).
+
+    """
+    asset_grid = np.asarray(asset_grid, dtype=float)
+    c = np.asarray(c, dtype=float)
+    z_vals = np.asarray(z_vals, dtype=float)
+    Pi_cdf = np.cumsum(Pi, axis=1)
+    steps = np.diff(asset_grid)
+    uniform = np.allclose(steps, steps[0])
+
+    # === preallocate the cross section and the statistics === #
+    a = np.empty(num_households)
+    a[:] = asset_grid[0] if a_init is None else a_init
+    z = np.empty(num_households, dtype=np.int64)
+    z[:] = z_init
+    stats = {'mean': np.empty(T)}
+    if bins is not None:
+        stats['hist'] = np.empty((T, len(bins) - 1), dtype=np.int64)
+    if quantiles is not None:
+        stats['quantiles'] = np.empty((T, len(quantiles)))
+
+    if seed is not None:
+        _seed(seed)
+    for t in range(T):
+        _panel_step(a, z, c, asset_grid, Pi_cdf, z_vals, R, uniform)
+        stats['mean'][t] = a.mean()
+        if bins is not None:
+            stats['hist'][t, :] = np.histogram(a, bins)[0]
+        if quantiles is not None:
+            stats['quantiles'][t, :] = np.percentile(a, np.multiply(quantiles,
+                                                                    100))
+
+    return a, z, stats
+
+
+@jit(nopython=True)
+def _seed(seed):
+    np.random.seed(seed)
+
+
+@jit(nopython=True)
+def _panel_step(a, z, c, asset_grid, Pi_cdf, z_vals, R, uniform):
+    """
+    Advance every household one period, updating a and z in place.  If
+    uniform is True the asset grid is evenly spaced, and the bracketing
+    grid points are found directly rather than by bisection.
+    """
+    z_size, grid_size = len(z_vals), len(asset_grid)
+    step = asset_grid[1] - asset_grid[0]
+    for i in range(len(a)):
+        z_i = z[i]
+        # == linear interpolation of c, constant beyond the grid == #
+        a_i = a[i]
+        if a_i <= asset_grid[0]:
+            c_i = c[0, z_i]
+        elif a_i >= asset_grid[-1]:
+            c_i = c[-1, z_i]
+        elif uniform:
+            lo = min(int((a_i - asset_grid[0]) / step), grid_size - 2)
+            hi = lo + 1
+            p = (a_i - asset_grid[lo]) / step
+            c_i = (1 - p) * c[lo, z_i] + p * c[hi, z_i]
+        else:
+            lo, hi = 0, grid_size - 1
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if asset_grid[mid] <= a_i:
+                    lo = mid
+                else:
+                    hi = mid
+            p = (a_i - asset_grid[lo]) / (asset_grid[hi] - asset_grid[lo])
+            c_i = (1 - p) * c[lo, z_i] + p * c[hi, z_i]
+        # == the max guards against rounding below the borrowing limit == #
+        a[i] = max(R * a_i + z_vals[z_i] - c_i, asset_grid[0])
+        U = np.random.random()
+        j = 0
+        while j < z_size - 1 and U > Pi_cdf[z_i, j]:
+            j += 1
+        z[i] = j
@@ -8,7 +8,7 @@ tests for quantecon.ifp
 from __future__ import division
 import unittest
 import numpy as np
-from ifp import ConsumerProblem
+from ifp import ConsumerProblem, simulate_panel, solve_batch
 from quantecon import compute_fixed_point
 from quantecon.tests import get_h5_data_file, write_array, max_abs_diff
 
@@ -144,6 +144,70 @@ class TestConsumerProblem(unittest.TestCase):
         new_c = self.cp.coleman_operator(self.c_pfi)
         self.assertLessEqual(max_abs_diff(self.c_pfi, new_c), 1e-3)
 
+    def test_golden_bellman_agrees(self):
+        "ifp: golden section and fminbound bellman operators agree"
+        new_v = self.cp.bellman_operator(self.v_vfi)
+        golden_v, golden_c = self.cp.golden_bellman(self.v_vfi)
+        self.assertLessEqual(max_abs_diff(new_v, golden_v), 1e-5)
+        self.assertLessEqual(max_abs_diff(self.c_vfi, golden_c), 1e-3)
+
+    def test_egm_coleman_solutions_agree(self):
+        "ifp: egm and coleman solutions agree"
+        c_egm = self.cp.solve_egm()
+        self.assertLessEqual(max_abs_diff(c_egm, self.c_pfi), 1e-2)
+
+    def test_egm_fp(self):
+        "ifp: solution from egm is a fixed point"
+        c_egm = self.cp.solve_egm(tol=1e-8)
+        new_c = self.cp.egm_operator(c_egm)
+        self.assertLessEqual(max_abs_diff(c_egm, new_c), 1e-7)
+
+    def test_solve_batch(self):
+        "ifp: batch solutions agree with individual solutions"
+        r_vals = [0.005, 0.01, 0.015]
+        c, num_iter, times = solve_batch(r_vals)
+        self.assertEqual(c.shape, (3,) + self.c_pfi.shape)
+        self.assertEqual(len(num_iter), 3)
+        self.assertEqual(len(times), 3)
+        for i, r in enumerate(r_vals):
+            c_single = ConsumerProblem(r=r).solve_egm()
+            self.assertLessEqual(max_abs_diff(c[i], c_single), 1e-6)
+
+    def test_solve_batch_beta_args(self):
+        "ifp: batch solutions reject inconsistent discount factors"
+        with self.assertRaises(ValueError):
+            solve_batch([0.01, 0.02], beta_vals=[0.96])
+        with self.assertRaises(ValueError):
+            solve_batch([0.01], beta_vals=[0.96], beta=0.95)
+
+    def test_simulate_panel(self):
+        "ifp: panel simulation is reproducible and stays on the grid"
+        cp = self.cp
+        args = self.c_pfi, cp.asset_grid, cp.Pi, cp.z_vals, cp.R
+        bins = cp.asset_grid[[0, -1]]
+        a, z, stats = simulate_panel(*args, num_households=500, T=20,
+                                     seed=42, bins=bins, quantiles=[0.5])
+        a_2, z_2, stats_2 = simulate_panel(*args, num_households=500, T=20,
+                                           seed=42)
+        self.assertTrue(np.array_equal(a, a_2))
+        self.assertTrue(np.array_equal(z, z_2))
+        self.assertEqual(stats['hist'].shape, (20, 1))
+        self.assertEqual(stats['quantiles'].shape, (20, 1))
+        self.assertTrue(np.all(stats['hist'] == 500))
+
+    def test_egm_custom_du(self):
+        "ifp: egm needs du_inv when du is not the default"
+        gamma = 2.0
+        kwargs = dict(u=lambda c: c**(1 - gamma) / (1 - gamma),
+                      du=lambda c: c**(-gamma))
+        cp = ConsumerProblem(**kwargs)
+        self.assertRaises(ValueError, cp.solve_egm)
+
+        cp = ConsumerProblem(du_inv=lambda x: x**(-1 / gamma), **kwargs)
+        c_egm = cp.solve_egm()
+        c_pfi = _solve_via_pfi(cp, cp.initialize()[1])
+        self.assertLessEqual(max_abs_diff(c_egm, c_pfi), 1e-2)
+
     def test_initialize(self):
         "ifp: initialize function works"
         i = self.cp.initialize()
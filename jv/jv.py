@@ -11,6 +11,8 @@ http://quant-econ.net/py/jv.html
 """
 from textwrap import dedent
 import sys
+import weakref
+from multiprocessing import Pool, RawArray, cpu_count
 import numpy as np
 from scipy.integrate import fixed_quad as integrate
 from scipy.optimize import minimize
@@ -97,6 +99,13 @@ class JvWorker(object):
         grid_max = max(A**(1 / (1 - alpha)), self.F.ppf(1 - epsilon))
         self.x_grid = np.linspace(epsilon, grid_max, grid_size)
 
+        # === Gauss-Legendre nodes and F-weights, as used by fixed_quad === #
+        a, b = self.F.ppf(0.005), self.F.ppf(0.995)
+        nodes, weights = np.polynomial.legendre.leggauss(5)
+        self._quad_nodes = (b - a) * (nodes + 1) / 2.0 + a
+        self._quad_weights = (b - a) / 2.0 * weights * \
+            self.F.pdf(self._quad_nodes)
+
     def __repr__(self):
         m = "JvWorker(A={a:g}, alpha={al:g}, beta={b:g}, grid_size={gs})"
         return m.format(a=self.A, al=self.alpha, b=self.beta,
@@ -114,7 +123,8 @@ class JvWorker(object):
         return dedent(m.format(a=self.A, al=self.alpha, b=self.beta,
                                gs=self.x_grid.size, gm=self.x_grid.max()))
 
-    def bellman_operator(self, V, brute_force=False, return_policies=False):
+    def bellman_operator(self, V, brute_force=False, return_policies=False,
+                         vectorized=False):
         """
         Returns the approximate value function TV by applying the
         Bellman operator associated with the model to the function V.
@@ -135,6 +145,9 @@ class JvWorker(object):
         return_policies : bool, optional(default=False)
             Indicates whether to return just the updated value function
             TV or both the greedy policy computed from V and TV
+        vectorized : bool, optional(default=False)
+            If True, the maximizations at all points of x_grid are
+            performed together by grid_bellman and brute_force is ignored
 
 
         Returns
@@ -147,10 +160,34 @@ class JvWorker(object):
             values TV(x) over x in x_grid.
 
         """
+        if vectorized:
+            new_V, s_policy, phi_policy = self.grid_bellman(V)
+            return (s_policy, phi_policy) if return_policies else new_V
+
+        new_V, s_policy, phi_policy = self._maximize(V, brute_force)
+        if return_policies:
+            return s_policy, phi_policy
+        else:
+            return new_V
+
+    def _maximize(self, V, brute_force=False, indices=None, guesses=None):
+        """
+        Solve the maximization problems on the r.h.s. of the Bellman
+        equation at x_grid[indices] (by default, at every point of
+        x_grid), and return the maximized values together with the
+        maximizing s and phi.  guesses, an array of shape
+        (len(indices), 2), gives the starting points for the optimizer,
+        which otherwise starts at (0.2, 0.2).  If the optimizer leaves
+        the feasible set from a given starting point, which can happen
+        when it starts on the boundary, it is restarted from (0.2, 0.2).
+        """
+        if indices is None:
+            indices = np.arange(len(self.x_grid))
+
         # === simplify names, set up arrays, etc. === #
         G, pi, F, beta = self.G, self.pi, self.F, self.beta
         Vf = lambda x: interp(x, self.x_grid, V)
-        N = len(self.x_grid)
+        N = len(indices)
         new_V, s_policy, phi_policy = np.empty(N), np.empty(N), np.empty(N)
         a, b = F.ppf(0.005), F.ppf(0.995)  # Quantiles, for integration
         c1 = lambda z: 1.0 - sum(z)          # used to enforce s + phi <= 1
@@ -160,7 +197,9 @@ class JvWorker(object):
         constraints = [{"type": "ineq", "fun": i} for i in [c1, c2, c3]]
 
         # === solve r.h.s. of Bellman equation === #
-        for i, x in enumerate(self.x_grid):
+        for i, x in enumerate(self.x_grid[indices]):
+            if guesses is not None:
+                guess = guesses[i]
 
             # === set up objective function === #
             def w(z):
@@ -176,6 +215,12 @@ class JvWorker(object):
                 max_s, max_phi = minimize(w, guess, constraints=constraints,
                                           options={"disp": 0},
                                           method=method)["x"]
+                if guesses is not None and not (
+                        min(max_s, max_phi) >= 0 and max_s + max_phi <= 1.0):
+                    max_s, max_phi = minimize(w, (0.2, 0.2),
+                                              constraints=constraints,
+                                              options={"disp": 0},
+                                              method=method)["x"]
                 max_val = -w((max_s, max_phi))
 
             # === or search on a grid === #
@@ -192,7 +237,281 @@ class JvWorker(object):
             new_V[i] = max_val
             s_policy[i], phi_policy[i] = max_s, max_phi
 
+        return new_V, s_policy, phi_policy
+
+    def grid_bellman(self, V, search_size=21, refine=12):
+        """
+        The approximate Bellman operator, maximizing over (s, phi) at
+        every x in x_grid simultaneously.  The objective is first
+        evaluated on a grid over the feasible set {s, phi >= epsilon,
+        s + phi <= 1}, then each maximizer is refined by a local search
+        over a 3 x 3 stencil whose width halves at every step, with
+        candidates projected back onto the feasible set.  The
+        expectation over U uses the same Gauss-Legendre rule as
+        bellman_operator, with nodes and weights precomputed at
+        construction.  G and pi must accept arrays.
+
+        Parameters
+        ----------
+        V : array_like(float)
+            Array representing an approximate value function
+        search_size : scalar(int), optional(default=21)
+            Number of points for each of s and phi in the initial grid
+        refine : scalar(int), optional(default=12)
+            Number of refinement steps
+
+        Returns
+        -------
+        new_V : array_like(float)
+            The updated value function TV
+        s_policy, phi_policy : array_like(float)
+            The V-greedy policies
+
+        """
+        x_grid = self.x_grid
+        x = x_grid[:, None]
+        w = lambda s, phi: self._objective(V, x, s, phi)
+
+        # === search on a grid over the feasible set === #
+        search_grid = np.linspace(epsilon, 1.0, search_size)
+        s, phi = np.meshgrid(search_grid, search_grid, indexing='ij')
+        feasible = s + phi <= 1.0
+        s, phi = s[feasible][None, :], phi[feasible][None, :]
+        vals = w(s, phi)
+        best = np.argmax(vals, axis=1)
+        max_val = vals[np.arange(len(x_grid)), best]
+        max_s, max_phi = s[0, best], phi[0, best]
+
+        # === refine locally around the best point for each x === #
+        h = search_grid[1] - search_grid[0]
+        offsets = np.array([-1.0, 0.0, 1.0])
+        ds, dphi = [d.ravel() for d in np.meshgrid(offsets, offsets)]
+        for i in range(refine):
+            h = h / 2
+            s = np.clip(max_s[:, None] + h * ds, epsilon, 1.0 - epsilon)
+            phi = np.clip(max_phi[:, None] + h * dphi, epsilon, 1.0 - s)
+            vals = w(s, phi)
+            best = np.argmax(vals, axis=1)
+            idx = np.arange(len(x_grid))
+            improved = vals[idx, best] > max_val
+            max_val = np.where(improved, vals[idx, best], max_val)
+            max_s = np.where(improved, s[idx, best], max_s)
+            max_phi = np.where(improved, phi[idx, best], max_phi)
+
+        return max_val, max_s, max_phi
+
+    def _objective(self, V, x, s, phi):
+        """
+        The value w(x, phi, s) of the maximand on the r.h.s. of the
+        Bellman equation, for arrays x, s and phi that broadcast
+        together, using the precomputed quadrature rule.
+        """
+        G, pi, beta, x_grid = self.G, self.pi, self.beta, self.x_grid
+        g = G(x, phi) + np.zeros(np.broadcast(x, s, phi).shape)
+        Vf = lambda y: interp(y.ravel(), x_grid, V).reshape(g.shape)
+        integral = sum(wt * Vf(np.maximum(g, u))
+                       for u, wt in zip(self._quad_nodes, self._quad_weights))
+        q = pi(s) * integral + (1.0 - pi(s)) * Vf(g)
+        return x * (1.0 - phi - s) + beta * q
+
+
+class ParallelBellman(object):
+    """
+    The Bellman operator of a JvWorker, with the maximization problems
+    at the points of x_grid shared out over a persistent pool of worker
+    processes.  Each call copies V once into a shared memory buffer
+    that the workers read from, so only the index blocks and the
+    results are sent between processes.  Instances are callable and can
+    be passed to compute_fixed_point in place of jv.bellman_operator.
+
+    The workers receive jv when the pool starts.  Where processes are
+    spawned rather than forked (e.g., on Windows), jv must therefore be
+    picklable, which excludes a G given as a lambda.
+
+    Call close, or use the instance as a context manager, to shut the
+    workers down when done.  Otherwise they are terminated when the
+    instance is garbage collected, or at interpreter exit.
+
+    Parameters
+    ----------
+    jv : JvWorker
+        An instance of JvWorker
+    processes : scalar(int), optional(default=None)
+        Number of worker processes.  If None, the number of CPUs
+    brute_force : bool, optional(default=False)
+        Passed on to bellman_operator
+    blocks_per_process : scalar(int), optional(default=4)
+        x_grid is split into this many contiguous blocks per process,
+        to balance the load across workers
+
+    Examples
+    --------
+    >>> jv = JvWorker()
+    >>> with ParallelBellman(jv) as T:
+    ...     V = compute_fixed_point(T, jv.x_grid * 0.5)
+
+    """
+
+    def __init__(self, jv, processes=None, brute_force=False,
+                 blocks_per_process=4):
+        self.jv = jv
+        self.processes = processes if processes is not None else cpu_count()
+        N = len(jv.x_grid)
+        num_blocks = min(N, self.processes * blocks_per_process)
+        self.blocks = np.array_split(np.arange(N), num_blocks)
+        self._V = RawArray('d', N)
+        self.pool = Pool(self.processes, _init_worker,
+                         (jv, self._V, brute_force))
+        self._finalizer = weakref.finalize(self, self.pool.terminate)
+
+    def __call__(self, V, return_policies=False):
+        """
+        Apply the Bellman operator to V.  Returns TV, or the V-greedy
+        policies s_policy and phi_policy when return_policies=True.
+        """
+        np.frombuffer(self._V)[:] = V
+        results = self.pool.map(_maximize_block, self.blocks, chunksize=1)
+        new_V, s_policy, phi_policy = [np.concatenate(r)
+                                       for r in zip(*results)]
         if return_policies:
             return s_policy, phi_policy
         else:
             return new_V
+
+    def close(self):
+        """
+        Shut down the worker processes.
+        """
+        self._finalizer.detach()
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class WarmStartBellman(object):
+    """
+    A stateful version of the Bellman operator of a JvWorker, for use
+    in value function iteration.  Between calls it keeps the greedy
+    policies found in the previous call and uses them as per-point
+    starting values for the SciPy optimizer, keeping the stored
+    policies wherever the optimizer does not improve on them.
+
+    Adding a constant to V leaves the maximizers (nearly) unchanged,
+    and in value iteration most of the change in V from one call to
+    the next is of this kind.  So the optimizer is skipped altogether
+    at points x_i where the change in V since the previous call
+    differs from its median change over x_grid by at most tol times
+    the largest change, and TV(x_i) is the objective evaluated at the
+    stored policies.  Since the maximizer at x_i also depends on V
+    elsewhere, and a warm started optimizer can stay at a local
+    maximum, every full_sweep calls all points are re-optimized from
+    the default starting point, and the stored policies are kept only
+    where they do better.
+
+    Parameters
+    ----------
+    jv : JvWorker
+        An instance of JvWorker
+    tol : scalar(float), optional(default=1e-2)
+        Relative tolerance for the change in the shape of V below
+        which a point is not re-optimized
+    full_sweep : scalar(int), optional(default=10)
+        Every full_sweep calls, all points are re-optimized from the
+        default starting point
+
+    Attributes
+    ----------
+    s_policy, phi_policy : array_like(float)
+        The greedy policies from the last call, or None before the
+        first call
+    policy_change : scalar(float)
+        The largest change in either policy in the last call
+    num_optimized : list(int)
+        Number of points re-optimized in each call
+
+    Examples
+    --------
+    >>> jv = JvWorker()
+    >>> T = WarmStartBellman(jv)
+    >>> V = compute_fixed_point(T, jv.x_grid * 0.5)
+    >>> s_policy, phi_policy = T.s_policy, T.phi_policy
+
+    """
+
+    def __init__(self, jv, tol=1e-2, full_sweep=10):
+        self.jv, self.tol, self.full_sweep = jv, tol, full_sweep
+        self.s_policy, self.phi_policy = None, None
+        self.policy_change = np.inf
+        self.num_optimized = []
+        self._V = None
+
+    def __call__(self, V, return_policies=False):
+        """
+        Apply the Bellman operator to V, updating the stored policies.
+        Returns TV, or the V-greedy policies s_policy and phi_policy
+        when return_policies=True.
+        """
+        jv, x_grid = self.jv, self.jv.x_grid
+        N = len(x_grid)
+        num_calls = len(self.num_optimized)
+        full = self._V is None or num_calls % self.full_sweep == 0
+
+        if full:
+            # === optimize everywhere from the default starting point === #
+            active = np.ones(N, dtype=bool)
+            new_V, s_policy, phi_policy = jv._maximize(V)
+            if self.s_policy is not None:
+                old_V = jv._objective(V, x_grid, self.s_policy,
+                                      self.phi_policy)
+                keep = old_V > new_V
+                new_V[keep] = old_V[keep]
+                s_policy[keep] = self.s_policy[keep]
+                phi_policy[keep] = self.phi_policy[keep]
+        else:
+            # === warm start where V changed shape, reuse policies === #
+            # === elsewhere, and never do worse than the old ones  === #
+            dV = V - self._V
+            shape_change = np.abs(dV - np.median(dV))
+            active = shape_change > self.tol * np.max(np.abs(dV))
+            s_policy, phi_policy = self.s_policy.copy(), self.phi_policy.copy()
+            new_V = jv._objective(V, x_grid, s_policy, phi_policy)
+            idx = np.flatnonzero(active)
+            guesses = np.column_stack((s_policy[idx], phi_policy[idx]))
+            opt_V, opt_s, opt_phi = jv._maximize(V, indices=idx,
+                                                 guesses=guesses)
+            better = opt_V > new_V[idx]
+            idx = idx[better]
+            new_V[idx] = opt_V[better]
+            s_policy[idx], phi_policy[idx] = opt_s[better], opt_phi[better]
+
+        if self.s_policy is not None:
+            self.policy_change = max(np.max(np.abs(s_policy - self.s_policy)),
+                                     np.max(np.abs(phi_policy -
+                                                   self.phi_policy)))
+        self.s_policy, self.phi_policy = s_policy, phi_policy
+        self.num_optimized.append(len(np.flatnonzero(active)))
+        self._V = np.array(V, copy=True)
+
+        if return_policies:
+            return s_policy, phi_policy
+        else:
+            return new_V
+
+
+# === state of ParallelBellman worker processes, set by _init_worker === #
+_worker = {}
+
+
+def _init_worker(jv, V_shared, brute_force):
+    _worker['jv'], _worker['brute_force'] = jv, brute_force
+    _worker['V'] = np.frombuffer(V_shared)
+
+
+def _maximize_block(indices):
+    return _worker['jv']._maximize(_worker['V'], _worker['brute_force'],
+                                   indices)
@@ -0,0 +1,75 @@
+"""
+tests for the alternative Bellman operators in jv.py
+
+These use a small grid and compute the fixed point directly, so unlike
+test_jv they need no stored solution and run under Python 3.
+
+"""
+from __future__ import division
+import unittest
+import numpy as np
+from jv import JvWorker, ParallelBellman, WarmStartBellman
+from quantecon import compute_fixed_point
+
+grid_size = 12
+
+
+def max_abs_diff(a, b):
+    return np.max(np.abs(np.asarray(a) - np.asarray(b)))
+
+
+class TestJvOperators(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        jv = JvWorker(grid_size=grid_size)
+        cls.jv = jv
+
+        # compute solution
+        v_init = jv.x_grid * 0.5
+        cls.V = compute_fixed_point(jv.bellman_operator, v_init,
+                                    error_tol=1e-4, max_iter=500,
+                                    verbose=False)
+        cls.s_pol, cls.phi_pol = jv.bellman_operator(cls.V * 0.999,
+                                                     return_policies=True)
+
+    def test_vectorized_bellman(self):
+        "jv: vectorized bellman at least as good as minimize"
+        new_V = self.jv.bellman_operator(self.V)
+        grid_V = self.jv.bellman_operator(self.V, vectorized=True)
+        self.assertGreaterEqual((grid_V - new_V).min(), -1e-6)
+        grid_V, s_pol, phi_pol = self.jv.grid_bellman(self.V)
+        self.assertTrue(((s_pol + phi_pol) <= 1).all())
+        self.assertEqual(s_pol.size, self.jv.x_grid.size)
+
+    def test_parallel_bellman(self):
+        "jv: parallel bellman matches bellman_operator"
+        with ParallelBellman(self.jv, processes=2) as T:
+            new_V = T(self.V)
+            s_pol, phi_pol = T(self.V * 0.999, return_policies=True)
+        self.assertLessEqual(max_abs_diff(new_V,
+                                          self.jv.bellman_operator(self.V)),
+                             1e-12)
+        self.assertLessEqual(max_abs_diff(s_pol, self.s_pol), 1e-12)
+        self.assertLessEqual(max_abs_diff(phi_pol, self.phi_pol), 1e-12)
+
+    def test_warm_start_bellman(self):
+        "jv: warm started bellman skips points and agrees with bellman"
+        T = WarmStartBellman(self.jv, full_sweep=10)
+        n = self.jv.x_grid.size
+
+        # the first call is a full sweep, so no worse than bellman
+        V = self.V
+        TV = T(V)
+        self.assertGreaterEqual((TV - self.jv.bellman_operator(V)).min(),
+                                -1e-12)
+        self.assertEqual(T.num_optimized[0], n)
+
+        for i in range(5):
+            V = TV
+            TV = T(V)
+        self.assertLess(min(T.num_optimized[1:]), n)
+        self.assertLessEqual(max_abs_diff(TV, self.jv.bellman_operator(V)),
+                             1e-6)
+        self.assertEqual(T.s_policy.size, n)
+        self.assertTrue(((T.s_policy + T.phi_policy) <= 1 + 1e-6).all())
@@ -38,6 +38,9 @@ import numpy as np
 from scipy import interp
 from scipy.stats import lognorm
 from scipy.integrate import fixed_quad
+from scipy.linalg import schur, solve_triangular
+from scipy.sparse import coo_matrix, identity
+from scipy.sparse.linalg import spsolve
 from quantecon import compute_fixed_point
 
 
@@ -59,6 +62,14 @@ class LucasTree:
         The volatility of the shock process
     grid_size : int
         The size of the grid to use
+    integration : str, optional(default='monte_carlo')
+        How expectations over the shock are computed.  'monte_carlo'
+        averages over 500 random draws of xi.  'gauss_hermite' uses
+        Gauss-Hermite quadrature in epsilon = log(xi) / sigma, which is
+        deterministic and accurate with far fewer nodes
+    num_nodes : int, optional(default=15)
+        The number of quadrature nodes, used when integration is
+        'gauss_hermite'
 
     Attributes
     ----------
@@ -67,6 +78,11 @@ class LucasTree:
         Properties for grid upon which prices are evaluated
     phi : scipy.stats.lognorm
         The distribution for the shock process
+    draws : ndarray
+        Values of the shock xi used to compute expectations, either
+        random draws or quadrature nodes
+    weights : ndarray
+        The probability weights of draws, which sum to one
 
     Examples
     --------
@@ -80,7 +96,9 @@ class LucasTree:
             beta=0.95, 
             alpha=0.90, 
             sigma=0.1, 
-            grid_size=100):
+            grid_size=100,
+            integration='monte_carlo',
+            num_nodes=15):
 
         self.gamma = gamma
         self.beta = beta
@@ -96,12 +114,22 @@ class LucasTree:
 
         # == set up distribution for shocks == #
         self.phi = lognorm(sigma)
-        self.draws = self.phi.rvs(500)
+        if integration == 'monte_carlo':
+            self.draws = self.phi.rvs(500)
+            self.weights = np.ones(500) / 500
+        elif integration == 'gauss_hermite':
+            nodes, weights = np.polynomial.hermite.hermgauss(num_nodes)
+            self.draws = np.exp(sigma * np.sqrt(2) * nodes)
+            self.weights = weights / np.sqrt(np.pi)
+        else:
+            raise ValueError("integration must be 'monte_carlo' or "
+                             "'gauss_hermite'")
 
         # == h(y) = beta * int G(y,z)^(1-gamma) phi(dz) == #
         self.h = np.empty(self.grid_size)
         for i, y in enumerate(self.grid):
-            self.h[i] = beta * np.mean((y**alpha * self.draws)**(1 - gamma))
+            self.h[i] = beta * np.dot(self.weights,
+                                      (y**alpha * self.draws)**(1 - gamma))
 
 
 
@@ -140,7 +168,7 @@ def lucas_operator(f, tree, Tf=None):
     """
     grid,  h = tree.grid, tree.h
     alpha, beta = tree.alpha, tree.beta
-    z_vec = tree.draws
+    z_vec, weights = tree.draws, tree.weights
 
     # == turn f into a function == #
     Af = lambda x: interp(x, grid, f)  
@@ -149,14 +177,49 @@ def lucas_operator(f, tree, Tf=None):
     if Tf is None:
         Tf = np.empty_like(f)
 
-    # == Apply the T operator to f using Monte Carlo integration == #
+    # == Apply the T operator to f, integrating over the draws == #
     for i, y in enumerate(grid):
-        Tf[i] = h[i] + beta * np.mean(Af(y**alpha * z_vec))
+        Tf[i] = h[i] + beta * np.dot(weights, Af(y**alpha * z_vec))
 
     return Tf
 
 
-def compute_lt_price(tree, error_tol=1e-6, max_iter=500, verbose=0):
+def lucas_weight_matrix(tree):
+    """
+    The matrix W of the linear map f -> Tf - h computed by
+    lucas_operator, divided by beta.  Row i holds the weights that
+    linear interpolation on the grid puts on f when averaging
+    f(y_i^alpha z) over the shocks z.  Each row has at most
+    2 * len(tree.draws) nonzeros, so W is stored as a sparse matrix.
+
+    Parameters
+    ----------
+    tree : instance of LucasTree
+        Stores the parameters of the problem
+
+    Returns
+    -------
+    W : scipy.sparse.csr_matrix
+        The interpolation weight matrix, of shape (grid_size, grid_size)
+
+    """
+    grid, alpha, z_vec = tree.grid, tree.alpha, tree.draws
+    n, m = len(grid), len(z_vec)
+    weights = tree.weights
+
+    # == points y_i^alpha z_k, clamped to the grid as interp does == #
+    x = np.clip(grid[:, None]**alpha * z_vec, grid[0], grid[-1])
+    j = np.clip(np.searchsorted(grid, x, side='right') - 1, 0, n - 2)
+    t = (x - grid[j]) / (grid[j + 1] - grid[j])
+
+    rows = np.repeat(np.arange(n), 2 * m)
+    cols = np.column_stack((j, j + 1)).ravel()
+    vals = (np.column_stack((1 - t, t)) * np.tile(weights, 2)).ravel()
+    return coo_matrix((vals, (rows, cols)), shape=(n, n)).tocsr()
+
+
+def compute_lt_price(tree, error_tol=1e-6, max_iter=500, verbose=0,
+                     method='iterate'):
     """
     Compute the equilibrium price function associated with Lucas
     tree lt
@@ -171,6 +234,13 @@ def compute_lt_price(tree, error_tol=1e-6, max_iter=500, verbose=0):
         `quantecon.compute_fixed_point`. See that docstring for more
         information
 
+    method : str, optional(default='iterate')
+        If 'iterate', the fixed point of lucas_operator is computed by
+        iteration.  If 'direct', the linear system (I - beta W) f = h
+        is solved by sparse LU, where W is given by
+        lucas_weight_matrix, and error_tol, max_iter and verbose are
+        ignored
+
     Returns
     -------
     price : array_like(float)
@@ -182,6 +252,13 @@ def compute_lt_price(tree, error_tol=1e-6, max_iter=500, verbose=0):
     grid, grid_size = tree.grid, tree.grid_size
     gamma = tree.gamma
 
+    if method == 'direct':
+        W = lucas_weight_matrix(tree)
+        A = identity(grid_size, format='csc') - tree.beta * W.tocsc()
+        return spsolve(A, tree.h) * grid**gamma
+    elif method != 'iterate':
+        raise ValueError("method must be 'iterate' or 'direct'")
+
     # == Create storage array for compute_fixed_point. Reduces  memory
     # allocation and speeds code up == #
     Tf = np.empty(grid_size)
@@ -200,3 +277,40 @@ def compute_lt_price(tree, error_tol=1e-6, max_iter=500, verbose=0):
     price = f * grid**gamma
 
     return price
+
+
+def compute_lt_prices(tree, betas, W=None):
+    """
+    Compute the equilibrium price functions of the Lucas tree for each
+    discount factor in betas, holding the other parameters of tree
+    fixed.  Since h is proportional to beta and W does not depend on
+    it, W is reduced once to complex Schur form W = Z S Z^H, after which
+    each (I - beta W) f = h is a triangular solve.
+
+    Parameters
+    ----------
+    tree : An instance of LucasTree
+        Contains parameters other than beta
+    betas : array_like(float)
+        The discount factors
+    W : scipy.sparse matrix, optional(default=None)
+        The output of lucas_weight_matrix(tree), if already computed
+
+    Returns
+    -------
+    prices : array_like(float)
+        Array of shape (len(betas), grid_size), where prices[k] is the
+        price function on the grid when the discount factor is betas[k]
+
+    """
+    if W is None:
+        W = lucas_weight_matrix(tree)
+    S, Z = schur(W.toarray(), output='complex')
+    h0 = np.dot(Z.conj().T, tree.h / tree.beta)
+    I = np.identity(tree.grid_size)
+
+    prices = np.empty((len(betas), tree.grid_size))
+    for k, beta in enumerate(betas):
+        u = solve_triangular(I - beta * S, beta * h0)
+        prices[k] = np.dot(Z, u).real * tree.grid**tree.gamma
+    return prices
@@ -8,7 +8,8 @@ Tests for lucastree
 from __future__ import division
 from nose.tools import (assert_equal, assert_true, assert_less_equal)
 import numpy as np
-from lucastree import LucasTree
+from lucastree import (LucasTree, lucas_operator, lucas_weight_matrix,
+                        compute_lt_price, compute_lt_prices)
 from quantecon.tests import (get_h5_data_file, get_h5_data_group, write_array,
                              max_abs_diff)
 
@@ -106,3 +107,46 @@ def test_lucas_prices_increasing():
     # sort the array and test that it is the same
     sorted = np.sort(np.copy(prices))
     np.testing.assert_array_equal(sorted, prices)
+
+
+def test_weight_matrix():
+    "lucastree: weight matrix reproduces lucas_operator"
+    W = lucas_weight_matrix(tree)
+    f = np.linspace(1.0, 2.0, len(grid))
+    Tf = tree.h + tree.beta * W.dot(f)
+    assert_less_equal(max_abs_diff(Tf, lucas_operator(f, tree)), 1e-12)
+    assert_less_equal(W.nnz, 2 * len(tree.draws) * len(grid))
+
+
+def test_direct_fixed_point():
+    "lucastree: direct solution is a fixed point of lucas_operator"
+    p = compute_lt_price(tree, method='direct')
+    f = p / grid**gamma
+    assert_less_equal(max_abs_diff(lucas_operator(f, tree), f), 1e-10)
+
+
+def test_compute_lt_prices():
+    "lucastree: prices for several betas match the direct solve"
+    p = compute_lt_price(tree, method='direct')
+    p_betas = compute_lt_prices(tree, [0.9, beta])
+    assert_equal(p_betas.shape, (2, len(grid)))
+    assert_less_equal(max_abs_diff(p_betas[1], p), 1e-8)
+    assert_true((p_betas[0] < p_betas[1]).all())
+
+
+def test_gauss_hermite():
+    "lucastree: gauss-hermite quadrature is deterministic and accurate"
+    tree_gh = LucasTree(gamma, beta, alpha, sigma,
+                        integration='gauss_hermite', num_nodes=15)
+    assert_less_equal(abs(tree_gh.weights.sum() - 1), 1e-12)
+    # E[xi] for lognormal xi
+    assert_less_equal(abs(np.dot(tree_gh.weights, tree_gh.draws) -
+                          np.exp(sigma**2 / 2)), 1e-12)
+    p = compute_lt_price(tree_gh, method='direct')
+    p_fine = compute_lt_price(LucasTree(gamma, beta, alpha, sigma,
+                                        integration='gauss_hermite',
+                                        num_nodes=60), method='direct')
+    assert_less_equal(max_abs_diff(p / p_fine, 1), 1e-3)
+    tree_gh_2 = LucasTree(gamma, beta, alpha, sigma,
+                          integration='gauss_hermite', num_nodes=15)
+    np.testing.assert_array_equal(tree_gh.h, tree_gh_2.h)
@@ -22,6 +22,7 @@ References
 import numpy as np
 import quantecon as qe
 from numpy.linalg import solve, eigvals
+from scipy.linalg import lu_factor, lu_solve
 
 
 class AssetPriceModel:
@@ -57,12 +58,14 @@ class AssetPriceModel:
 
     def test_stability(self, Q):
         """
-        Stability test for a given matrix Q.
+        Stability test for a given matrix Q.  Returns the spectral radius
+        of Q if the test passes.
         """
         sr = np.max(np.abs(eigvals(Q)))
         if not sr < 1 / self.beta:
             msg = "Spectral radius condition failed with radius = %f" % sr
             raise ValueError(msg)
+        return sr
 
 
 
@@ -172,3 +175,145 @@ def call_option(ap, zeta, p_s, epsilon=1e-7):
         w = w_new
 
     return w
+
+
+class AssetPricingEngine:
+    r"""
+    Prices assets in a given AssetPriceModel, reusing work across
+    calls.  The stability test and the LU factorization of
+    I - beta Q, for Q = M (stochastic discount factor times transition
+    probabilities, used for consols and options) or Q = J (used for the
+    Lucas tree), are computed the first time they are needed and then
+    cached, so that each further price costs one triangular solve.
+    Several payoff streams, coupons or strikes can be priced together.
+
+    The cache is not refreshed if the primitives of ap are changed
+    afterwards; create a new engine instead.
+
+    Parameters
+    ----------
+    ap : AssetPriceModel
+        An instance of AssetPriceModel containing primitives
+
+    Attributes
+    ----------
+    M, J : array_like(float)
+        The matrices P * g(y)^(-gamma) and P * g(y)^(1 - gamma)
+    spectral_radius : dict
+        The spectral radii of M and J, keyed by 'M' and 'J', once
+        computed
+
+    Examples
+    --------
+    >>> ap = AssetPriceModel()
+    >>> engine = AssetPricingEngine(ap)
+    >>> p = engine.consol_price([1.0, 2.0, 3.0])  # shape (ap.n, 3)
+    >>> w = engine.call_option(1.0, [30.0, 40.0, 50.0])
+
+    """
+    def __init__(self, ap):
+        self.ap = ap
+        gamma, P, y = ap.gamma, ap.mc.P, ap.mc.state_values
+        self.M = P * ap.g(y)**(- gamma)
+        self.J = P * ap.g(y)**(1 - gamma)
+        self.spectral_radius = {}
+        self._lu = {}
+
+    def _factor(self, name):
+        """
+        The LU factorization of I - beta Q for Q = M or J, after checking
+        that a unique solution exists.
+        """
+        if name not in self._lu:
+            Q = getattr(self, name)
+            self.spectral_radius[name] = self.ap.test_stability(Q)
+            I = np.identity(self.ap.n)
+            self._lu[name] = lu_factor(I - self.ap.beta * Q)
+        return self._lu[name]
+
+    def tree_price(self):
+        """
+        Computes the price-dividend ratio of the Lucas tree, as in
+        tree_price.
+        """
+        beta, J = self.ap.beta, self.J
+        return lu_solve(self._factor('J'), beta * J @ np.ones(self.ap.n))
+
+    def price(self, payoffs):
+        """
+        Computes the prices of claims to the payoff streams in payoffs,
+        discounted with M.  Column k of payoffs is a function of the
+        state giving the payoff of claim k in every period from the next
+        one on.
+
+        Parameters
+        ----------
+        payoffs : array_like(float)
+            Array of shape (n,) or (n, k)
+
+        Returns
+        -------
+        p : array_like(float)
+            Prices, with the same shape as payoffs
+
+        """
+        beta, M = self.ap.beta, self.M
+        return lu_solve(self._factor('M'), beta * M @ np.asarray(payoffs))
+
+    def consol_price(self, zeta):
+        """
+        Computes prices of consol bonds, as in consol_price.
+
+        Parameters
+        ----------
+        zeta : scalar(float) or array_like(float)
+            Coupon, or vector of coupons, of the consols
+
+        Returns
+        -------
+        p : array_like(float)
+            Consol prices, of shape (n,) for a scalar zeta and
+            (n, len(zeta)) otherwise
+
+        """
+        zeta = np.asarray(zeta, dtype=float)
+        return self.price(np.ones(self.ap.n)[:, None] * zeta.ravel()
+                          ).reshape((self.ap.n,) + zeta.shape)
+
+    def call_option(self, zeta, p_s, epsilon=1e-7):
+        """
+        Computes prices of call options on consol bonds, as in
+        call_option.  The value iterations for all pairs of coupon and
+        strike price are run together.
+
+        Parameters
+        ----------
+        zeta : scalar(float) or array_like(float)
+            Coupons of the consols
+        p_s : scalar(float) or array_like(float)
+            Strike prices, broadcast together with zeta
+        epsilon : scalar(float), optional(default=1e-7)
+            Tolerance for infinite horizon problem
+
+        Returns
+        -------
+        w : array_like(float)
+            Infinite horizon call option prices, of shape (n,) plus the
+            broadcast shape of zeta and p_s
+
+        """
+        zeta, p_s = np.broadcast_arrays(np.asarray(zeta, dtype=float),
+                                        np.asarray(p_s, dtype=float))
+        shape = (self.ap.n,) + zeta.shape
+        beta, M = self.ap.beta, self.M
+
+        # == Compute option prices == #
+        payoff = self.consol_price(zeta.ravel()) - p_s.ravel()
+        w = np.zeros(payoff.shape)
+        error = epsilon + 1
+        while error > epsilon:
+            w_new = np.maximum(beta * M @ w, payoff)
+            error = np.amax(np.abs(w - w_new))
+            w = w_new
+
+        return w.reshape(shape)
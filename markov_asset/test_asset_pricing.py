@@ -0,0 +1,47 @@
+"""
+Tests for asset_pricing
+
+"""
+from __future__ import division
+import unittest
+import numpy as np
+from asset_pricing import (AssetPriceModel, AssetPricingEngine, tree_price,
+                           consol_price, call_option)
+
+
+class TestAssetPricingEngine(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ap = AssetPriceModel(beta=0.9)
+        cls.engine = AssetPricingEngine(cls.ap)
+
+    def test_tree_price(self):
+        "asset_pricing: engine tree price agrees with tree_price"
+        np.testing.assert_allclose(self.engine.tree_price(),
+                                   tree_price(self.ap), rtol=1e-10)
+        # second call uses the cached factorization
+        np.testing.assert_allclose(self.engine.tree_price(),
+                                   tree_price(self.ap), rtol=1e-10)
+        self.assertIn('J', self.engine.spectral_radius)
+
+    def test_consol_price(self):
+        "asset_pricing: engine consol prices agree with consol_price"
+        zetas = [0.5, 1.0, 2.0]
+        p = self.engine.consol_price(zetas)
+        self.assertEqual(p.shape, (self.ap.n, len(zetas)))
+        for k, zeta in enumerate(zetas):
+            np.testing.assert_allclose(p[:, k], consol_price(self.ap, zeta),
+                                       rtol=1e-10)
+        np.testing.assert_allclose(self.engine.consol_price(1.0),
+                                   consol_price(self.ap, 1.0), rtol=1e-10)
+
+    def test_call_option(self):
+        "asset_pricing: engine option prices agree with call_option"
+        zeta, strikes = 1.0, [20.0, 30.0, 40.0]
+        w = self.engine.call_option(zeta, strikes)
+        self.assertEqual(w.shape, (self.ap.n, len(strikes)))
+        for k, p_s in enumerate(strikes):
+            np.testing.assert_allclose(w[:, k],
+                                       call_option(self.ap, zeta, p_s),
+                                       atol=1e-5)
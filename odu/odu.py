@@ -9,11 +9,12 @@ quantecon lecture.
 
 """
 from scipy.interpolate import LinearNDInterpolator
-from scipy.integrate import fixed_quad
 from scipy.stats import beta as beta_distribution
+from scipy.special import betaln
 from scipy import interp
 from numpy import maximum as npmax
 import numpy as np
+from numba import jit
 
 
 class SearchProblem(object):
@@ -44,7 +45,7 @@ class SearchProblem(object):
 
     Attributes
     ----------
-    beta, c, w_max : see Parameters
+    beta, c, w_max, F_a, F_b, G_a, G_b : see Parameters
     w_grid : np.ndarray
         Grid points over wages, ndim=1
     pi_grid : np.ndarray
@@ -63,12 +64,24 @@ class SearchProblem(object):
         Minimum of grid over pi
     pi_max : scalar(float)
         Maximum of grid over pi
+    quad_nodes, quad_weights : np.ndarray
+        Gauss-Legendre nodes and weights on [0, w_max]
+    q_vals : np.ndarray
+        q_vals[i, k] = q(quad_nodes[k], pi_grid[i])
+    kernel : np.ndarray
+        kernel[i, k] is quad_weights[k] times the density of the wage
+        offer m = quad_nodes[k] given belief pi = pi_grid[i], that is,
+        pi f(m) + (1 - pi) g(m)
+    v_interp : BilinearInterpolator
+        Interpolates a function on grid_points at the points
+        (quad_nodes[k], q_vals[i, k])
     """
 
     def __init__(self, beta=0.95, c=0.6, F_a=1, F_b=1, G_a=3, G_b=1.2,
                  w_max=2, w_grid_size=40, pi_grid_size=40):
 
         self.beta, self.c, self.w_max = beta, c, w_max
+        self.F_a, self.F_b, self.G_a, self.G_b = F_a, F_b, G_a, G_b
         self.F = beta_distribution(F_a, F_b, scale=w_max)
         self.G = beta_distribution(G_a, G_b, scale=w_max)
         self.f, self.g = self.F.pdf, self.G.pdf    # Density functions
@@ -76,8 +89,20 @@ class SearchProblem(object):
         self.w_grid = np.linspace(0, w_max, w_grid_size)
         self.pi_grid = np.linspace(self.pi_min, self.pi_max, pi_grid_size)
         x, y = np.meshgrid(self.w_grid, self.pi_grid)
-        self.grid_points = np.column_stack((x.ravel(1), y.ravel(1)))
-
+        self.grid_points = np.column_stack((x.ravel('F'), y.ravel('F')))
+
+        # == Quadrature nodes m_k and weights on [0, w_max], as used by
+        # fixed_quad, and the updated beliefs q(m_k, pi) for pi in
+        # pi_grid, with shape (len(pi_grid), len(m)) == #
+        nodes, weights = np.polynomial.legendre.leggauss(5)
+        self.quad_nodes = w_max * (nodes + 1) / 2.0
+        self.quad_weights = w_max * weights / 2.0
+        pi, m = self.pi_grid[:, None], self.quad_nodes
+        self.q_vals = self.q(m, pi)
+        self.kernel = self.quad_weights * (pi * self.f(m) +
+                                           (1 - pi) * self.g(m))
+        self.v_interp = BilinearInterpolator(self.w_grid, self.pi_grid,
+                                             self.quad_nodes, self.q_vals)
 
     def q(self, w, pi):
         """
@@ -98,7 +123,24 @@ class SearchProblem(object):
 
         return new_pi
 
-    def bellman_operator(self, v):
+    def _continuation_values(self, v, interpolation='bilinear'):
+        """
+        The value c + beta E v(w', q(w', pi)) of rejecting an offer, for
+        each pi in pi_grid.  It doesn't depend on the current wage.
+        """
+        if interpolation == 'bilinear':
+            v_vals = self.v_interp(v)
+        elif interpolation == 'delaunay':
+            vf = LinearNDInterpolator(self.grid_points, v)
+            m = self.quad_nodes + np.zeros(self.q_vals.shape)
+            v_vals = vf(m, self.q_vals)
+        else:
+            raise ValueError("interpolation must be 'bilinear' or "
+                             "'delaunay'")
+
+        return self.c + self.beta * np.sum(self.kernel * v_vals, axis=1)
+
+    def bellman_operator(self, v, interpolation='bilinear'):
         """
 
         The Bellman operator.  Including for comparison. Value function
@@ -107,74 +149,54 @@ class SearchProblem(object):
 
         Parameters
         ----------
-        v : array_like(float, ndim=1, length=len(pi_grid))
+        v : array_like(float, ndim=1, length=len(grid_points))
             An approximate value function represented as a
             one-dimensional array.
+        interpolation : str, optional(default='bilinear')
+            How v is interpolated off the grid: 'bilinear' for
+            v_interp, or 'delaunay' for a LinearNDInterpolator built on
+            grid_points
 
         Returns
         -------
-        new_v : array_like(float, ndim=1, length=len(pi_grid))
+        new_v : array_like(float, ndim=1, length=len(grid_points))
             The updated value function
 
         """
-        # == Simplify names == #
-        f, g, beta, c, q = self.f, self.g, self.beta, self.c, self.q
-
-        vf = LinearNDInterpolator(self.grid_points, v)
-        N = len(v)
-        new_v = np.empty(N)
+        v1 = self.w_grid[:, None] / (1 - self.beta)
+        v2 = self._continuation_values(v, interpolation)
+        return np.maximum(v1, v2).ravel()
 
-        for i in range(N):
-            w, pi = self.grid_points[i, :]
-            v1 = w / (1 - beta)
-            integrand = lambda m: vf(m, q(m, pi)) * (pi * f(m)
-                                                     + (1 - pi) * g(m))
-            integral, error = fixed_quad(integrand, 0, self.w_max)
-            v2 = c + beta * integral
-            new_v[i] = max(v1, v2)
-
-        return new_v
-
-    def get_greedy(self, v):
+    def get_greedy(self, v, interpolation='bilinear'):
         """
         Compute optimal actions taking v as the value function.
 
         Parameters
         ----------
-        v : array_like(float, ndim=1, length=len(pi_grid))
+        v : array_like(float, ndim=1, length=len(grid_points))
             An approximate value function represented as a
             one-dimensional array.
+        interpolation : str, optional(default='bilinear')
+            As in bellman_operator
 
         Returns
         -------
-        policy : array_like(float, ndim=1, length=len(pi_grid))
+        policy : array_like(float, ndim=1, length=len(grid_points))
             The decision to accept or reject an offer where 1 indicates
             accept and 0 indicates reject
 
         """
-        # == Simplify names == #
-        f, g, beta, c, q = self.f, self.g, self.beta, self.c, self.q
-
-        vf = LinearNDInterpolator(self.grid_points, v)
-        N = len(v)
-        policy = np.zeros(N, dtype=int)
-
-        for i in range(N):
-            w, pi = self.grid_points[i, :]
-            v1 = w / (1 - beta)
-            integrand = lambda m: vf(m, q(m, pi)) * (pi * f(m) +
-                                                     (1 - pi) * g(m))
-            integral, error = fixed_quad(integrand, 0, self.w_max)
-            v2 = c + beta * integral
-            policy[i] = v1 > v2  # Evaluates to 1 or 0
-
-        return policy
+        v1 = self.w_grid[:, None] / (1 - self.beta)
+        v2 = self._continuation_values(v, interpolation)
+        return (v1 > v2).astype(int).ravel()
 
     def res_wage_operator(self, phi):
         """
 
         Updates the reservation wage function guess phi via the operator
-        Q.
+        Q.  The integrals for all pi in pi_grid are computed together,
+        using the quadrature nodes, updated beliefs and offer densities
+        stored at construction.
 
         Parameters
         ----------
@@ -187,17 +209,170 @@ class SearchProblem(object):
             The updated reservation wage guess.
 
         """
-        # == Simplify names == #
-        beta, c, f, g, q = self.beta, self.c, self.f, self.g, self.q
-        # == Turn phi into a function == #
-        phi_f = lambda p: interp(p, self.pi_grid, phi)
-
-        new_phi = np.empty(len(phi))
-        for i, pi in enumerate(self.pi_grid):
-            def integrand(x):
-                "Integral expression on right-hand side of operator"
-                return npmax(x, phi_f(q(x, pi))) * (pi*f(x) + (1 - pi)*g(x))
-            integral, error = fixed_quad(integrand, 0, self.w_max)
-            new_phi[i] = (1 - beta) * c + beta * integral
+        # == phi(q(m_k, pi_i)) for every quadrature node and pi_i == #
+        phi_vals = interp(self.q_vals, self.pi_grid, phi)
+        integrand = npmax(self.quad_nodes, phi_vals)
+        new_phi = (1 - self.beta) * self.c + \
+            self.beta * np.sum(self.kernel * integrand, axis=1)
 
         return new_phi
+
+    def simulate(self, w_bar, num_agents=10000, T=100, pi_init=0.5,
+                 true_dist='F', seed=None, num_paths=0):
+        """
+        Simulate a cohort of unemployed agents who search with the
+        reservation wage function w_bar and learn about the offer
+        distribution by Bayes' rule.  Each agent draws an offer w from
+        the true distribution in every period, accepts it if w is at
+        least w_bar(pi), and otherwise updates pi to q(w, pi).  Agents
+        are simulated one after another in compiled code, and only
+        per-agent outcomes and per-period summaries are kept.
+
+        Parameters
+        ----------
+        w_bar : array_like(float, ndim=1, length=len(pi_grid))
+            The reservation wage function on pi_grid, such as the fixed
+            point of res_wage_operator
+        num_agents : scalar(int), optional(default=10000)
+            Number of agents
+        T : scalar(int), optional(default=100)
+            Maximum number of periods of search
+        pi_init : scalar(float), optional(default=0.5)
+            The initial belief that offers are drawn from F
+        true_dist : str, optional(default='F')
+            The distribution offers are actually drawn from, 'F' or 'G'
+        seed : scalar(int), optional(default=None)
+            Seed for the random number generator
+        num_paths : scalar(int), optional(default=0)
+            Number of agents, taken from the start of the cohort, whose
+            belief paths are recorded in full
+
+        Returns
+        -------
+        accept_times : array_like(int)
+            The period in which each agent accepts an offer, or -1 if
+            no offer is accepted within T periods
+        wages : array_like(float)
+            The accepted wage of each agent, or nan
+        pi_final : array_like(float)
+            The belief of each agent when the search ends
+        stats : dict
+            'searching' is an array of length T with the number of
+            agents still searching at the start of each period, and
+            'mean_pi' the mean belief among them.  'paths' has shape
+            (num_paths, T) and holds the belief at the start of each
+            period, or nan once the agent has accepted an offer.
+
+        """
+        if true_dist == 'F':
+            a, b = self.F_a, self.F_b
+        elif true_dist == 'G':
+            a, b = self.G_a, self.G_b
+        else:
+            raise ValueError("true_dist must be 'F' or 'G'")
+
+        # == g(w) / f(w) = exp(log_c) x^d1 (1 - x)^d2, x = w / w_max == #
+        d1, d2 = self.G_a - self.F_a, self.G_b - self.F_b
+        log_c = betaln(self.F_a, self.F_b) - betaln(self.G_a, self.G_b)
+
+        accept_times = np.empty(num_agents, dtype=np.int64)
+        wages, pi_final = np.empty(num_agents), np.empty(num_agents)
+        stats = {'searching': np.zeros(T, dtype=np.int64),
+                 'mean_pi': np.zeros(T),
+                 'paths': np.full((num_paths, T), np.nan)}
+
+        if seed is not None:
+            _seed(seed)
+        _simulate_search(np.asarray(w_bar, dtype=float), self.pi_grid,
+                         a, b, d1, d2, log_c, self.w_max, self.pi_min,
+                         self.pi_max, pi_init, accept_times, wages,
+                         pi_final, stats['searching'], stats['mean_pi'],
+                         stats['paths'])
+        stats['mean_pi'] /= np.maximum(stats['searching'], 1)
+
+        return accept_times, wages, pi_final, stats
+
+
+class BilinearInterpolator(object):
+    """
+    Bilinear interpolation of functions on the tensor grid x_grid x
+    y_grid, at a fixed set of points (x, y).  The grid cell containing
+    each point and its weights are found once at construction, so each
+    call only forms a weighted sum of four grid values per point.
+    Points outside the grid are extrapolated linearly from the
+    nearest cell.
+
+    Parameters
+    ----------
+    x_grid, y_grid : array_like(float, ndim=1)
+        Increasing grids, each with at least two points
+    x, y : array_like(float)
+        Coordinates of the points, arrays that broadcast together
+
+    Examples
+    --------
+    >>> w_grid, pi_grid = np.linspace(0, 2, 40), np.linspace(0, 1, 30)
+    >>> vf = BilinearInterpolator(w_grid, pi_grid, [0.5, 1.5], 0.3)
+    >>> vf(v)  # v of shape (40, 30), or flattened in C order
+
+    """
+
+    def __init__(self, x_grid, y_grid, x, y):
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=float),
+                                   np.asarray(y, dtype=float))
+        self.shape, self.grid_shape = x.shape, (len(x_grid), len(y_grid))
+        self.i, self.tx = self._bracket(np.asarray(x_grid), x.ravel())
+        self.j, self.ty = self._bracket(np.asarray(y_grid), y.ravel())
+
+    @staticmethod
+    def _bracket(grid, z):
+        i = np.searchsorted(grid, z, side='right') - 1
+        i = np.minimum(np.maximum(i, 0), len(grid) - 2)
+        t = (z - grid[i]) / (grid[i + 1] - grid[i])
+        return i, t
+
+    def __call__(self, values):
+        """
+        Interpolate values, an array of function values on the grid with
+        shape (len(x_grid), len(y_grid)) or flattened in C order, at the
+        points.  Returns an array with the broadcast shape of x and y.
+        """
+        values = np.asarray(values).reshape(self.grid_shape)
+        i, j, tx, ty = self.i, self.j, self.tx, self.ty
+        out = ((1 - tx) * ((1 - ty) * values[i, j] + ty * values[i, j + 1]) +
+               tx * ((1 - ty) * values[i + 1, j] + ty * values[i + 1, j + 1]))
+        return out.reshape(self.shape)
+
+
+@jit(nopython=True)
+def _seed(seed):
+    np.random.seed(seed)
+
+
+@jit(nopython=True)
+def _simulate_search(w_bar, pi_grid, a, b, d1, d2, log_c, w_max, pi_min,
+                     pi_max, pi_init, accept_times, wages, pi_final,
+                     searching, sum_pi, paths):
+    T = len(searching)
+    for i in range(len(accept_times)):
+        pi = pi_init
+        accept_times[i], wages[i] = -1, np.nan
+        for t in range(T):
+            searching[t] += 1
+            sum_pi[t] += pi
+            if i < paths.shape[0]:
+                paths[i, t] = pi
+            w = w_max * np.random.beta(a, b)
+            if w >= np.interp(pi, pi_grid, w_bar):
+                accept_times[i], wages[i] = t, w
+                break
+            # == Bayes' rule, as in SearchProblem.q == #
+            x = w / w_max
+            log_ratio = log_c
+            if d1 != 0:
+                log_ratio += d1 * np.log(x)
+            if d2 != 0:
+                log_ratio += d2 * np.log(1 - x)
+            pi = 1.0 / (1 + (1 - pi) * np.exp(log_ratio) / pi)
+            pi = max(min(pi, pi_max), pi_min)
+        pi_final[i] = pi
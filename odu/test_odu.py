@@ -9,7 +9,7 @@ from __future__ import division
 import numpy as np
 from nose.tools import (assert_equal, assert_true, assert_less_equal)
 from quantecon import compute_fixed_point
-from odu import SearchProblem
+from odu import SearchProblem, BilinearInterpolator
 from quantecon.tests import (get_h5_data_file, get_h5_data_group, write_array,
                              max_abs_diff)
 
@@ -136,3 +136,50 @@ def test_phi_pfi_fixed_point():
     "odu: phi from pfi is fixed point"
     new_phi = sp.res_wage_operator(phi_pfi)
     assert_less_equal(max_abs_diff(new_phi, phi_pfi), _tol*10)
+
+
+def test_bilinear_interpolator_exact():
+    "odu: bilinear interpolation exact for bilinear functions"
+    f = lambda w, pi: 1 + 2 * w - 3 * pi + 4 * w * pi
+    w, pi = np.meshgrid(sp.w_grid, sp.pi_grid, indexing='ij')
+    x, y = np.array([0.1, 1.3, 2.0]), np.array([[0.2], [0.5]])
+    vf = BilinearInterpolator(sp.w_grid, sp.pi_grid, x, y)
+    assert_equal(vf(f(w, pi)).shape, (2, 3))
+    assert_less_equal(max_abs_diff(vf(f(w, pi).ravel()), f(x, y)), 1e-12)
+
+
+def test_bellman_interpolation_agree():
+    "odu: bilinear and delaunay interpolation give similar bellman"
+    new_v_delaunay = sp.bellman_operator(v, interpolation='delaunay')
+    new_v_bilinear = sp.bellman_operator(v)
+    assert_less_equal(max_abs_diff(new_v_delaunay, new_v_bilinear), 1e-3)
+
+
+def test_res_wage_operator_quad():
+    "odu: res_wage_operator matches fixed_quad at each pi"
+    from scipy.integrate import fixed_quad
+    phi = np.linspace(1.0, 0.5, len(sp.pi_grid))
+    new_phi = sp.res_wage_operator(phi)
+    for i, pi in enumerate(sp.pi_grid):
+        h = lambda x: (np.maximum(x, np.interp(sp.q(x, pi), sp.pi_grid, phi)) *
+                       (pi * sp.f(x) + (1 - pi) * sp.g(x)))
+        integral, error = fixed_quad(h, 0, sp.w_max)
+        expected = (1 - sp.beta) * sp.c + sp.beta * integral
+        assert_less_equal(abs(new_phi[i] - expected), 1e-12)
+
+
+def test_simulate():
+    "odu: simulated search outcomes"
+    T = 50
+    times, wages, pi_final, stats = sp.simulate(phi_pfi, num_agents=1000,
+                                                T=T, seed=1, num_paths=5)
+    assert_true(((times >= -1) & (times < T)).all())
+    accepted = times >= 0
+    # accepted wages are at least the reservation wage at the final belief
+    w_bar = np.interp(pi_final[accepted], sp.pi_grid, phi_pfi)
+    assert_true((wages[accepted] >= w_bar).all())
+    assert_true(np.isnan(wages[~accepted]).all())
+    assert_equal(stats['searching'][0], 1000)
+    assert_equal(stats['paths'].shape, (5, T))
+    times_2 = sp.simulate(phi_pfi, num_agents=1000, T=T, seed=1)[0]
+    np.testing.assert_array_equal(times, times_2)